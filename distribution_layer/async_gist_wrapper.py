@@ -0,0 +1,605 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import Optional, List, AsyncIterator
+
+try:
+    import aiohttp
+except ImportError:  # optional, only this module needs it
+    aiohttp = None
+
+from distribution_layer.rendezvous_backend import index_posts, group_posts
+from distribution_layer.gist_wrapper import (
+    PRIORITY_UPSERT,
+    PRIORITY_CHANGED,
+    PRIORITY_SCAN,
+    RateLimitExceeded,
+    RateLimitScheduler,
+    RawContentCache,
+    _gist_payload,
+    _graphql_owners_query,
+    _graphql_owners_gists,
+    _changed_page,
+    _advance_since,
+    _split_contents,
+    _fill_contents,
+    _with_contents,
+    _OwnerFetch,
+)
+
+
+class AsyncRateLimitScheduler(RateLimitScheduler):
+    """
+    RateLimitScheduler for a single event loop: the same budget tracking and
+    pacing, but acquire() is a coroutine that waits on the loop instead of
+    blocking a thread, so a paced scan never holds up an upsert.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._changed = asyncio.Event()
+
+    def _wake(self) -> None:
+        # Wake every waiter once, later waiters wait on a fresh event
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def acquire(self, priority: int) -> None:
+        """
+        Wait until a request of this priority may be sent.
+        Lower priorities also wait while a higher priority request is queued.
+        """
+        self._waiting[priority] += 1
+        try:
+            deadline = time.time() + self.max_wait
+            delayed = False
+            while (timeout := self._wait_time(priority, deadline)) is not None:
+                if not delayed:
+                    delayed = True
+                    self.throttled += 1
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+            self._record_sent(priority)
+        finally:
+            self._waiting[priority] -= 1
+            self._wake()
+
+    def update(self, response) -> None:
+        super().update(response)
+        self._wake()
+
+
+class AsyncGitHubGistUserStore:
+    """
+    asyncio counterpart of gist_wrapper.GitHubGistUserStore.
+
+    Same API, but every method is a coroutine, the iter_* methods are async
+    generators, and all requests share one pooled keep-alive aiohttp session,
+    so listing, posting and content downloads of many groups can overlap on a
+    single event loop. Being async it is not a RendezvousBackend: Group cannot
+    use it. The bookkeeping (fetch strategy, GraphQL batching, cursors) is
+    shared with the sync store, only the IO differs.
+
+    Needs the optional aiohttp dependency (pip install aiohttp).
+    """
+
+    def __init__(
+        self,
+        token: str,
+        owner: str,
+        group_name: str,
+        gist_id: Optional[str] = None,
+        public: bool = False,
+        max_connections: int = 16,
+        base_url: str = "https://api.github.com",
+        graphql: bool = False,
+        raw_cache: Optional[RawContentCache] = None,
+    ):
+        """
+        :param token: GitHub personal access token
+        :param owner: GitHub username that owns the gists
+        :param group: Group name stored in gist description
+        :param gist_id: Existing gist ID (optional)
+        :param public: Whether created gists should be public
+        :param max_connections: Size of the keep-alive connection pool
+        :param base_url: API root, point it at a local stand-in (see local_store) for testing
+        :param graphql: Fetch members' posts through batched GraphQL queries (see the sync store)
+        :param raw_cache: On disk cache of raw_url downloads (optional)
+        """
+        if aiohttp is None:
+            raise ImportError("AsyncGitHubGistUserStore needs aiohttp: pip install aiohttp")
+
+        self.owner = owner
+        self.group = group_name
+        self.gist_id = gist_id
+        self.public = public
+
+        self.BASE_URL = base_url.rstrip("/")
+        self.FILENAME = "user_data.txt"
+
+        self.headers = {
+            "Authorization": f"token {token}",
+            "Accept": "application/vnd.github+json",
+        }
+        self.max_connections = max_connections
+        self.session = None
+
+        # (url, params) -> (etag, parsed json body) of the last 200 response
+        self._etag_cache = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        # updated_at high-water mark of the last listing, for incremental polls
+        self.since_cursor: Optional[str] = None
+
+        self.scheduler = AsyncRateLimitScheduler()
+        self.graphql_scheduler = AsyncRateLimitScheduler(resource="graphql")
+
+        # Pages of the last full and incremental feed listings, to price a scan
+        self.feed_pages: Optional[int] = None
+        self.changed_pages: Optional[int] = None
+        self.targeted_max_owners = 30
+        # Strategy and cost of the last get_changed_gists_for_owners call
+        self.last_fetch: Optional[dict] = None
+
+        self.graphql = graphql
+        self.graphql_owners_per_query = 50
+
+        self.raw_cache = raw_cache
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    # -------------------------
+    # Internal helpers
+    # -------------------------
+
+    def _description(self) -> str:
+        return f"[group:{self.group}]-[owner:{self.owner}]"
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        # Created lazily, aiohttp sessions must be made inside a running loop
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_connections)
+            self.session = aiohttp.ClientSession(headers=self.headers, connector=connector)
+        return self.session
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        priority: int,
+        scheduler: Optional[AsyncRateLimitScheduler] = None,
+        **kwargs,
+    ) -> "aiohttp.ClientResponse":
+        """
+        Send an API request once the rate limit scheduler allows it. The body is
+        read before returning, so .json() and .raise_for_status() work on the result.
+
+        :param scheduler: Scheduler of the budget the request is charged to, `scheduler` (REST) by default
+        """
+        scheduler = scheduler or self.scheduler
+        await scheduler.acquire(priority)
+
+        async with self._get_session().request(method, url, **kwargs) as response:
+            await response.read()
+
+        # The scheduler reads requests style responses
+        status = SimpleNamespace(status_code=response.status, headers=response.headers)
+        scheduler.update(status)
+        if scheduler.is_rate_limited(status):
+            raise RateLimitExceeded(f"{method} {url} was rate limited: {scheduler.budget()}")
+        return response
+
+    async def _get_json(self, url: str, params: Optional[dict] = None, priority: int = PRIORITY_SCAN):
+        """
+        GET a JSON resource with a conditional request (see GitHubGistUserStore._get_json).
+        """
+        cache_key = (url, tuple(sorted((params or {}).items())))
+        cached = self._etag_cache.get(cache_key)
+
+        headers = {}
+        if cached is not None:
+            headers["If-None-Match"] = cached[0]
+
+        response = await self._request("GET", url, priority, params=params, headers=headers)
+
+        if response.status == 304 and cached is not None:
+            self.cache_hits += 1
+            return cached[1]
+
+        response.raise_for_status()
+        self.cache_misses += 1
+
+        body = await response.json(content_type=None)
+        etag = response.headers.get("ETag")
+        if etag:
+            self._etag_cache[cache_key] = (etag, body)
+        else:
+            self._etag_cache.pop(cache_key, None)
+        return body
+
+    async def _fetch_raw(self, raw_url: str) -> str:
+        # The cache reads and writes files, keep that off the event loop
+        if self.raw_cache is not None:
+            content = await asyncio.to_thread(self.raw_cache.get, raw_url)
+            if content is not None:
+                return content
+
+        # raw_urls are served outside the API and do not count against the rate limit
+        async with self._get_session().get(raw_url) as response:
+            response.raise_for_status()
+            content = await response.text()
+
+        if self.raw_cache is not None:
+            await asyncio.to_thread(self.raw_cache.put, raw_url, content)
+        return content
+
+    async def _list_gists(self, since: Optional[str] = None) -> List[dict]:
+        """
+        Walk every page of the gist listing, optionally only gists updated since `since`.
+        """
+        return [gist async for page_gists in self._iter_gist_pages(since) for gist in page_gists]
+
+    async def _iter_gist_pages(self, since: Optional[str] = None) -> AsyncIterator[List[dict]]:
+        """
+        Yield the gist listing page by page, as each page arrives.
+        """
+        page = 1
+        while True:
+            params = {"per_page": 30, "page": page}
+            if since:
+                params["since"] = since
+
+            priority = PRIORITY_CHANGED if since else PRIORITY_SCAN
+            page_gists = await self._get_json(f"{self.BASE_URL}/gists", params=params, priority=priority)
+
+            if not page_gists:
+                break
+
+            yield page_gists
+
+            # A short page is the last one, no need to ask for an empty page
+            if len(page_gists) < params["per_page"]:
+                break
+            page += 1
+
+        if since:
+            self.changed_pages = page
+        else:
+            self.feed_pages = page
+
+    async def _list_owner_gists(self, owner: str) -> List[dict]:
+        """
+        Walk every page of one owner's gists.
+        """
+        gists = []
+        page = 1
+        while True:
+            params = {"per_page": 100, "page": page}
+            page_gists = await self._get_json(f"{self.BASE_URL}/users/{owner}/gists", params=params)
+
+            if not page_gists:
+                break
+
+            gists.extend(page_gists)
+
+            if len(page_gists) < params["per_page"]:
+                break
+            page += 1
+
+        return gists
+
+    async def _list_owner_posts(self, owner: str, group: str) -> List[dict]:
+        """
+        One owner's posts in group with their contents filled in, as one task,
+        so the downloads of many owners overlap like their listings do.
+        """
+        gists = index_posts(await self._list_owner_gists(owner), group).get(owner, [])
+
+        contents, pending = _split_contents(gists)
+        fetched = await asyncio.gather(*(self._fetch_raw(raw_url) for _, _, raw_url in pending))
+        _fill_contents(contents, pending, fetched)
+        return _with_contents(gists, contents)
+
+    async def _iter_completed(self, coros: list) -> AsyncIterator[list]:
+        """
+        Run coros concurrently, yielding the results of everything that finished
+        since the previous yield (see GitHubGistUserStore._imap_completed).
+        """
+        pending = {asyncio.ensure_future(coro) for coro in coros}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                yield [task.result() for task in done]
+        finally:
+            # The caller stopped early or a task failed, do not leave the rest running
+            for task in pending:
+                task.cancel()
+
+    async def _graphql(self, query: str, variables: dict) -> dict:
+        """
+        Run a GraphQL query, returns its data. Missing users come back as None.
+        """
+        response = await self._request(
+            "POST", f"{self.BASE_URL}/graphql", PRIORITY_SCAN,
+            scheduler=self.graphql_scheduler,
+            json={"query": query, "variables": variables},
+        )
+        response.raise_for_status()
+
+        body = await response.json(content_type=None)
+        errors = [error for error in body.get("errors") or [] if error.get("type") != "NOT_FOUND"]
+        if errors or body.get("data") is None:
+            raise RuntimeError(f"GraphQL query failed: {errors or body}")
+        return body["data"]
+
+    async def _iter_owners_gists_graphql(self, owners: List[str]) -> AsyncIterator[List[dict]]:
+        """
+        Every gist of every owner, contents included, graphql_owners_per_query owners
+        per query, yielded query by query. Owners with more than 100 gists are
+        followed up by cursor in later queries.
+        """
+        pending = [(owner, None) for owner in owners]  # (owner, cursor)
+        while pending:
+            batch = pending[:self.graphql_owners_per_query]
+            pending = pending[self.graphql_owners_per_query:]
+
+            data = await self._graphql(*_graphql_owners_query(batch))
+
+            gists, follow_ups = _graphql_owners_gists(data, batch)
+            pending.extend(follow_ups)
+            yield gists
+
+    async def _create_gist(self, content: str) -> str:
+        payload = _gist_payload(self._description(), self.FILENAME, content)
+        payload["public"] = self.public
+
+        response = await self._request("POST", f"{self.BASE_URL}/gists", PRIORITY_UPSERT, json=payload)
+        response.raise_for_status()
+
+        gist_id = (await response.json(content_type=None))["id"]
+        self.gist_id = gist_id
+        return gist_id
+
+    async def _update_gist(self, content: str) -> None:
+        if not self.gist_id:
+            raise RuntimeError("Cannot update gist without gist_id")
+
+        response = await self._request(
+            "PATCH",
+            f"{self.BASE_URL}/gists/{self.gist_id}",
+            PRIORITY_UPSERT,
+            json=_gist_payload(self._description(), self.FILENAME, content)
+        )
+        if response.status == 404:
+            # Deleted behind our back, let upsert_user create a new one
+            self.gist_id = None
+            return
+        response.raise_for_status()
+
+    # -------------------------
+    # Public API
+    # -------------------------
+
+    async def upsert_user(self, content: str) -> str:
+        """
+        Automatically creates or updates the user gist.
+
+        :return: gist_id
+        """
+        if self.gist_id is not None:
+            await self._update_gist(content)
+
+        if self.gist_id is None:
+            return await self._create_gist(content)
+
+        return self.gist_id
+
+    async def find_own_gist_id(self) -> Optional[str]:
+        """
+        Look up the id of our post for this group in the owner's first 100 gists.
+        """
+        owner_gists = await self._get_json(
+            f"{self.BASE_URL}/users/{self.owner}/gists",
+            params={"per_page": 100, "page": 1},
+            priority=PRIORITY_UPSERT,
+        )
+
+        for gist in owner_gists:
+            if gist.get("description") == self._description() and self.FILENAME in gist.get("files", {}):
+                return gist["id"]
+        return None
+
+    async def delete_gist(self, gist_id: str) -> None:
+        """
+        Delete a gist (only works for gists owned by the token's user).
+        """
+        response = await self._request("DELETE", f"{self.BASE_URL}/gists/{gist_id}", PRIORITY_UPSERT)
+        response.raise_for_status()
+
+        if gist_id == self.gist_id:
+            self.gist_id = None
+
+    async def get_user_content(self) -> str:
+        """
+        Fetch the contents of this user's gist.
+        """
+        if not self.gist_id:
+            raise RuntimeError("No gist_id set on this instance")
+
+        gist = await self._get_json(f"{self.BASE_URL}/gists/{self.gist_id}", priority=PRIORITY_UPSERT)
+        return gist["files"][self.FILENAME]["content"]
+
+    async def get_group_users(self) -> List[dict]:
+        """
+        Get all gists that have this group name in their description, and contain the expected filename.
+        """
+        gists = []
+        for gist in await self._list_gists():
+            if gist.get("description") == self._description() and self.FILENAME in gist.get("files", {}):
+                gists.append(gist)
+
+        return gists
+
+    async def get_group_user_contents(self) -> List[str]:
+        """
+        Convenience method to fetch contents of all group gists.
+        """
+        contents = []
+
+        for gist_contents in await self.get_gists_contents(await self.get_group_users()):
+            content = gist_contents.get(self.FILENAME)
+            if content is not None:
+                contents.append(content)
+
+        return contents
+
+    async def get_gists_by_key_discription(self, key: str, since: Optional[str] = None) -> List[dict]:
+        """
+        Get all posts of group `key` (exact match on the parsed description, so
+        "net" does not pick up "net-staging").
+
+        :param since: only list gists updated at or after this ISO 8601 time
+        """
+        return group_posts(await self._list_gists(since), key)
+
+    async def get_changed_gists_by_key_discription(self, key: str, full: bool = False) -> List[dict]:
+        """
+        Incremental variant of get_gists_by_key_discription (see the sync store).
+        """
+        return [gist async for page_gists in self.iter_changed_gists_by_key_discription(key, full) for gist in page_gists]
+
+    async def iter_changed_gists_by_key_discription(self, key: str, full: bool = False) -> AsyncIterator[List[dict]]:
+        """
+        Streaming get_changed_gists_by_key_discription: yields the matches page by page.
+        The cursor only moves once the listing is walked to the end.
+        """
+        since = None if full else self.since_cursor
+
+        newest = since
+        async for page_gists in self._iter_gist_pages(since):
+            gists, newest = _changed_page(page_gists, key, newest)
+            yield gists
+
+        _advance_since(self, newest)
+
+    async def get_changed_gists_for_owners(self, key: str, owners: List[str], full: bool = False) -> List[dict]:
+        """
+        Gists of group `key` owned by one of owners, fetched however is cheapest
+        (see the sync store). The strategy and its cost are recorded in `last_fetch`.
+        """
+        return [gist async for batch_gists in self.iter_changed_gists_for_owners(key, owners, full) for gist in batch_gists]
+
+    async def iter_changed_gists_for_owners(self, key: str, owners: List[str], full: bool = False) -> AsyncIterator[List[dict]]:
+        """
+        Streaming get_changed_gists_for_owners: yields the matches of each page (or
+        owner, or GraphQL query) as soon as it arrives. `last_fetch` is recorded once
+        the listing is walked to the end.
+        """
+        fetch = _OwnerFetch(self, key, owners, full)
+
+        if fetch.strategy == "targeted":
+            batches = self._iter_completed([self._list_owner_posts(owner, key) for owner in fetch.owners])
+        elif fetch.strategy == "graphql":
+            batches = self._iter_owners_gists_graphql(fetch.owners)
+        else:
+            batches = self.iter_changed_gists_by_key_discription(key, full=full)
+
+        async for batch in batches:
+            if fetch.strategy == "targeted":
+                batch = [gist for owner_gists in batch for gist in owner_gists]
+            yield fetch.matches(batch)
+
+        self.last_fetch = fetch.summary()
+
+    async def get_gist_contents(self, gist: dict) -> dict:
+        """
+        Fetch the contents of a specific gist.
+        """
+        return (await self.get_gists_contents([gist]))[0]
+
+    async def get_gists_contents(self, gists: List[dict]) -> List[dict]:
+        """
+        Fetch the contents of many gists, all raw_url downloads (those not already
+        in raw_cache) in flight at once, bounded by the connection pool.
+
+        :return: one {filename: content} dict per gist, in the same order as gists
+        """
+        contents, pending = _split_contents(gists)
+        fetched = await asyncio.gather(*(self._fetch_raw(raw_url) for _, _, raw_url in pending))
+        _fill_contents(contents, pending, fetched)
+        return contents
+
+    def get_gist_id(self, gist: dict) -> int:
+        """
+        Extract the gist ID from a gist object.
+        """
+        return gist.get("id")
+
+
+
+
+##tests
+
+
+
+async def test1(token: str):
+    async with AsyncGitHubGistUserStore(
+        token=token,
+        owner="your-username",
+        group_name="backend-team",
+        public=True
+    ) as store:
+
+        # Fetch gists by key in description
+        key = "backend-team"
+        gists = await store.get_gists_by_key_discription(key)
+        print(f"Found {len(gists)} gists with '{key}' in description.")
+
+        # Fetch contents of all of them concurrently
+        for gist, contents in zip(gists, await store.get_gists_contents(gists)):
+            print(f"Gist ID: {store.get_gist_id(gist)}")
+            print(f"Contents: {contents}")
+
+
+async def test2(members: int = 100):
+    """
+    Post and discover against the local stand-in, no token needed.
+    """
+    from distribution_layer.local_store import LocalGistServer
+
+    with LocalGistServer() as server:
+        for i in range(members):
+            server.seed(f"[group:load-test]-[owner:member{i}]", f"post {i}", owner=f"member{i}")
+
+        async with AsyncGitHubGistUserStore(
+            token="me",
+            owner="me",
+            group_name="load-test",
+            base_url=server.url,
+        ) as store:
+            gist_id = await store.upsert_user("my post")
+            print(f"posted {gist_id}, found again: {await store.find_own_gist_id() == gist_id}")
+
+            owners = [f"member{i}" for i in range(members)]
+            start = time.time()
+            gists = await store.get_changed_gists_for_owners("load-test", owners)
+            print(f"{len(gists)} posts in {time.time() - start:.2f}s, last fetch: {store.last_fetch}")
+
+
+if __name__ == "__main__":
+    token = '' #  <----- add token hire
+
+    asyncio.run(test1(token))
@@ -2,6 +2,12 @@ import nacl.utils
 from nacl.secret import SecretBox
 from nacl.hash import blake2b
 from nacl.encoding import RawEncoder
+from functools import lru_cache
+
+
+# v2 blobs: V2_MAGIC || nonce || ciphertext, one key per group key.
+# v1 blobs: salt (16) || nonce || ciphertext, one key per message.
+V2_MAGIC = b"CNe2"
 
 
 # -----------------------------
@@ -21,14 +27,90 @@ def _derive_key(group_key: bytes, salt: bytes) -> bytes:
     )
 
 
+@lru_cache(maxsize=64)
+def group_key_id(group_key: bytes) -> bytes:
+    """
+    Short public id of a group key (8 bytes). Posts carry it in clear so
+    readers can tell which key a message needs without trying to decrypt it.
+    """
+    return blake2b(
+        group_key,
+        digest_size=8,
+        encoder=RawEncoder,
+        person=b"wg-grp-key-id",
+    )
+
+
+class GroupKeyring:
+    """
+    The current group key plus the other keys still accepted for reading
+    (previous keys during a rotation, or the next key before it is used).
+    Messages name their key by group_key_id, so picking one is a dict lookup.
+    """
+
+    def __init__(self, current: bytes, accepted: list = ()):
+        """
+        :param current: Key new messages are encrypted with
+        :param accepted: Other keys messages may be encrypted with
+        """
+        self.current = current
+        self._keys = {}
+        for key in [current, *accepted]:
+            self.add(key)
+
+    def add(self, group_key: bytes) -> None:
+        if not isinstance(group_key, bytes):
+            raise TypeError("group_key must be bytes")
+        self._keys[group_key_id(group_key)] = group_key
+
+    def remove(self, group_key: bytes) -> None:
+        if group_key == self.current:
+            raise ValueError("Cannot remove the current group key")
+        self._keys.pop(group_key_id(group_key), None)
+
+    def set_current(self, group_key: bytes) -> None:
+        self.add(group_key)
+        self.current = group_key
+
+    def get(self, key_id: bytes):
+        return self._keys.get(key_id)
+
+    def keys(self) -> list:
+        return list(self._keys.values())
+
+    def __contains__(self, group_key: bytes) -> bool:
+        return group_key_id(group_key) in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+@lru_cache(maxsize=64)
+def _group_box(group_key: bytes) -> SecretBox:
+    """
+    The v2 SecretBox of a group key. The key is derived once and the box
+    cached, so messages only carry a nonce.
+    """
+    key = blake2b(
+        group_key,
+        digest_size=SecretBox.KEY_SIZE,
+        encoder=RawEncoder,
+        person=b"wg-grp-enc-v2",
+    )
+    return SecretBox(key)
+
+
 # -----------------------------
 # Encrypt
 # -----------------------------
 
-def encrypt(data: bytes, group_key: bytes) -> bytes:
+def encrypt(data: bytes, group_key: bytes, version: int = 2) -> bytes:
     """
     Encrypts data using a group key.
     Returns a single opaque blob.
+
+    :param version: 2 (default) uses the cached per group key, 1 derives a
+                    key from a random salt for every message (older readers)
     """
 
     if not isinstance(data, bytes):
@@ -36,6 +118,13 @@ def encrypt(data: bytes, group_key: bytes) -> bytes:
     if not isinstance(group_key, bytes):
         raise TypeError("group_key must be bytes")
 
+    if version == 2:
+        # SecretBox.encrypt returns nonce || ciphertext
+        nonce = nacl.utils.random(SecretBox.NONCE_SIZE)
+        return V2_MAGIC + _group_box(group_key).encrypt(data, nonce)
+    if version != 1:
+        raise ValueError(f"Unknown encryption version: {version}")
+
     salt = nacl.utils.random(16)
     key = _derive_key(group_key, salt)
 
@@ -56,6 +145,10 @@ def decrypt(encrypted_data: bytes, group_key: bytes) -> bytes:
     """
     Decrypts data using a group key.
     Raises if authentication fails.
+
+    The format is read from the blob first, so a v2 blob costs one cached
+    dict lookup and the box open, with no key derivation. (A v1 salt starts
+    with V2_MAGIC with probability 2**-32, such a blob is not readable.)
     """
 
     if not isinstance(encrypted_data, bytes):
@@ -63,6 +156,9 @@ def decrypt(encrypted_data: bytes, group_key: bytes) -> bytes:
     if not isinstance(group_key, bytes):
         raise TypeError("group_key must be bytes")
 
+    if encrypted_data.startswith(V2_MAGIC):
+        return _group_box(group_key).decrypt(encrypted_data[len(V2_MAGIC):])
+
     salt = encrypted_data[:16]
     ciphertext = encrypted_data[16:]
 
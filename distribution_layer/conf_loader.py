@@ -2,11 +2,21 @@ import json
 import os
 import sys
 from distribution_layer import rsa_enryption as rsa
+from distribution_layer import ed25519_signing as ed25519
 
 
-def create_config_file(token: str, username: str, group_name: str, group_key: str):
+def create_config_file(token: str, username: str, group_name: str, group_key: str, signature_suite: str = "rsa"):
+    """
+    :param signature_suite: "rsa" or "ed25519", the kind of identity key pair to generate.
+                            Ed25519 posts are only readable by peers that support post format v2.
+    """
 
-    key_pair = rsa.generate_rsa_keys()
+    if signature_suite == "ed25519":
+        key_pair = ed25519.generate_ed25519_keys()
+    elif signature_suite == "rsa":
+        key_pair = rsa.generate_rsa_keys()
+    else:
+        raise ValueError(f"Unknown signature suite: {signature_suite}")
 
     file_name = f"config.json"
 
@@ -15,9 +25,13 @@ def create_config_file(token: str, username: str, group_name: str, group_key: st
         "token": token,
         "PEM_private_key": key_pair[0].decode(),
         "PEM_public_key": key_pair[1].decode(),
+        "signature_suite": signature_suite,
         "username": username,
         "group_name": group_name,
         "group_key": group_key,
+        "accepted_group_keys": [],
+        "post_format": "json",  # "compact" once every member reads v3 posts
+        "gist_id": None,
         "members": []
     }
 
@@ -48,6 +62,39 @@ def load_config_file() -> dict:
     
     return config
 
+def update_config_file(updates: dict):
+    """
+    Set some keys of the config file, leaving the rest as is.
+    """
+    file_name = "config.json"
+    config = load_config_file()
+    config.update(updates)
+
+    with open(file_name, "w") as f:
+        json.dump(config, f, indent=4)
+
+def rotate_group_key_in_config(new_group_key: str):
+    """
+    Make new_group_key the group key, keeping the old one in accepted_group_keys
+    so posts of members that have not rotated yet are still read.
+    """
+    config = load_config_file()
+    accepted = [key for key in config.get("accepted_group_keys", []) if key != new_group_key]
+    if config["group_key"] != new_group_key and config["group_key"] not in accepted:
+        accepted.append(config["group_key"])
+
+    update_config_file({"group_key": new_group_key, "accepted_group_keys": accepted})
+
+
+def retire_group_key_in_config(old_group_key: str):
+    """
+    Stop accepting old_group_key, once every member posts with the current key.
+    """
+    config = load_config_file()
+    accepted = [key for key in config.get("accepted_group_keys", []) if key != old_group_key]
+    update_config_file({"accepted_group_keys": accepted})
+
+
 def add_member_to_config(name: str, rsa_public_key: str):
     file_name = "config.json"
     member_data = {
@@ -0,0 +1,151 @@
+from nacl.signing import SigningKey, VerifyKey
+from nacl.exceptions import BadSignatureError
+from functools import lru_cache
+import base64
+import time
+
+# Ed25519 keys are stored as PEM like the RSA ones (PKCS8 / SubjectPublicKeyInfo),
+# their DER is a fixed prefix followed by the 32 raw key bytes
+_PKCS8_PREFIX = bytes.fromhex("302e020100300506032b657004220420")
+_SPKI_PREFIX = bytes.fromhex("302a300506032b6570032100")
+
+
+def _to_pem(der: bytes, label: str) -> bytes:
+    b64 = base64.b64encode(der).decode()
+    lines = [b64[i:i + 64] for i in range(0, len(b64), 64)]
+    return (f"-----BEGIN {label}-----\n" + "\n".join(lines) + f"\n-----END {label}-----\n").encode()
+
+
+def _from_pem(pem: bytes, prefix: bytes) -> bytes:
+    """
+    Raw 32 key bytes out of a PEM, raises ValueError if it is not an Ed25519 key.
+    """
+    if isinstance(pem, str):
+        pem = pem.encode()
+    body = b"".join(line for line in pem.strip().splitlines() if not line.startswith(b"-----"))
+    der = base64.b64decode(body)
+    if len(der) != len(prefix) + 32 or not der.startswith(prefix):
+        raise ValueError("Not an Ed25519 key")
+    return der[len(prefix):]
+
+
+def is_ed25519_key(pem: bytes) -> bool:
+    """
+    True if pem is an Ed25519 private or public key.
+    """
+    for prefix in (_PKCS8_PREFIX, _SPKI_PREFIX):
+        try:
+            _from_pem(pem, prefix)
+            return True
+        except Exception:
+            pass
+    return False
+
+
+def generate_ed25519_keys():
+    """
+    Generate an Ed25519 key pair as PEM (private PKCS8, public SubjectPublicKeyInfo).
+    """
+    signing_key = SigningKey.generate()
+
+    pem_private = _to_pem(_PKCS8_PREFIX + bytes(signing_key), "PRIVATE KEY")
+    pem_public = _to_pem(_SPKI_PREFIX + bytes(signing_key.verify_key), "PUBLIC KEY")
+
+    return pem_private, pem_public
+
+
+def load_ed25519_private_key(pem_private: bytes) -> SigningKey:
+    return SigningKey(_from_pem(pem_private, _PKCS8_PREFIX))
+
+
+def load_ed25519_public_key(pem_public: bytes) -> VerifyKey:
+    return VerifyKey(_from_pem(pem_public, _SPKI_PREFIX))
+
+
+class Signer:
+    """
+    Signs with a private key that is parsed once.
+    """
+
+    def __init__(self, private_key: bytes):
+        """
+        :param private_key: PEM encoded Ed25519 private key
+        """
+        self.private_key = load_ed25519_private_key(private_key)
+
+    def sign(self, message: bytes) -> bytes:
+        return self.private_key.sign(message).signature
+
+
+class Verifier:
+    """
+    Verifies against a public key that is parsed once.
+    """
+
+    def __init__(self, public_key: bytes):
+        """
+        :param public_key: PEM encoded Ed25519 public key
+        """
+        self.public_key = load_ed25519_public_key(public_key)
+
+    def verify(self, message: bytes, signature: bytes) -> bool:
+        """
+        Returns True if valid, False otherwise.
+        """
+        try:
+            self.public_key.verify(message, signature)
+            return True
+        except (BadSignatureError, ValueError):
+            return False
+
+
+@lru_cache(maxsize=16)
+def get_signer(private_key: bytes) -> Signer:
+    return Signer(private_key)
+
+
+@lru_cache(maxsize=4096)
+def get_verifier(public_key: bytes) -> Verifier:
+    return Verifier(public_key)
+
+
+def sign_message(private_key: bytes, message: bytes) -> bytes:
+    """
+    Sign a message using the Ed25519 private key.
+    """
+    return get_signer(private_key).sign(message)
+
+
+def verify_signature(public_key: bytes, message: bytes, signature: bytes) -> bool:
+    """
+    Verify a message's signature using the Ed25519 public key.
+    Returns True if valid, False otherwise.
+    """
+    return get_verifier(public_key).verify(message, signature)
+
+
+
+
+def bench1(n: int = 2000):
+    """
+    Per post sign / verify cost.
+    """
+    pem_private, pem_public = generate_ed25519_keys()
+    message = b'{"endpoint": "[::1]:51820", "username": "bench", "wg_pk": "x"}'
+
+    start = time.perf_counter()
+    for _ in range(n):
+        signature = sign_message(pem_private, message)
+    signed = (time.perf_counter() - start) / n
+
+    start = time.perf_counter()
+    for _ in range(n):
+        verify_signature(pem_public, message, signature)
+    verified = (time.perf_counter() - start) / n
+
+    print(f"ed25519 sign:   {signed * 1e6:8.1f} us/post, {len(signature)} byte signature")
+    print(f"ed25519 verify: {verified * 1e6:8.1f} us/post, {len(pem_public)} byte public key PEM")
+
+
+if __name__ == "__main__":
+    bench1()
@@ -1,5 +1,314 @@
 import requests
-from typing import Optional, List
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional, List, Iterator
+from distribution_layer.rendezvous_backend import index_posts, group_posts
+from collections import OrderedDict
+import threading
+import time
+import math
+import hashlib
+import os
+import re
+
+
+# Request priorities, lower goes first
+PRIORITY_UPSERT = 0   # our own post
+PRIORITY_CHANGED = 1  # incremental polls for changed members
+PRIORITY_SCAN = 2     # full feed scans
+
+_PRIORITY_NAMES = ("upsert", "changed", "scan")
+
+
+class RateLimitExceeded(RuntimeError):
+    pass
+
+
+class RateLimitScheduler:
+    """
+    Tracks GitHub's rate limit budget from the response headers and paces
+    requests by priority.
+
+    - Each priority has a reserve (fraction of the limit) it may not dip into,
+      so full scans run out long before our own upserts do.
+    - Below `slowdown_below` of the limit the remaining budget of a priority is
+      spread evenly over the rest of the window instead of being burnt at once.
+    - Retry-After, or an exhausted budget on a 403/429, blocks every request
+      until the given time.
+    - A request that would have to wait longer than `max_wait` raises
+      RateLimitExceeded instead of blocking the caller.
+
+    GitHub keeps a separate budget per resource (core REST, graphql, ...), so
+    use one scheduler per resource; headers of other resources are ignored.
+    """
+
+    def __init__(
+        self,
+        reserve: tuple = (0.0, 0.05, 0.2),
+        slowdown_below: float = 0.5,
+        max_wait: float = 60.0,
+        resource: str = "core",
+    ):
+        """
+        :param resource: The X-RateLimit-Resource whose budget this tracks
+        """
+        self.resource = resource
+        self.reserve = reserve
+        self.slowdown_below = slowdown_below
+        self.max_wait = max_wait
+
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None  # epoch seconds
+        self.blocked_until = 0.0
+
+        self.sent = [0, 0, 0]
+        self.throttled = 0
+
+        self._waiting = [0, 0, 0]
+        self._last_sent = 0.0
+        self._cond = threading.Condition()
+
+    def _delay(self, priority: int, now: float) -> float:
+        """
+        Seconds a request of this priority has to wait before it may be sent.
+        """
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.remaining is None or not self.limit:
+            return 0.0
+
+        reset_in = max(0.0, self.reset_at - now) if self.reset_at else 0.0
+        usable = self.remaining - self.reserve[priority] * self.limit
+        if usable <= 0:
+            # Nothing left for this priority until the window resets
+            return reset_in
+
+        if self.remaining < self.slowdown_below * self.limit:
+            interval = reset_in / usable
+            return max(0.0, self._last_sent + interval - now)
+
+        return 0.0
+
+    def _wait_time(self, priority: int, deadline: float) -> Optional[float]:
+        """
+        None once a request of this priority may be sent, otherwise how long to
+        wait at most before asking again (a budget update wakes waiters earlier).
+        Raises RateLimitExceeded if the wait would run past deadline.
+        """
+        now = time.time()
+        delay = self._delay(priority, now)
+        if delay <= 0 and not any(self._waiting[:priority]):
+            return None
+
+        if now + delay > deadline:
+            raise RateLimitExceeded(
+                f"{_PRIORITY_NAMES[priority]} request would wait {delay:.0f}s for rate limit budget"
+            )
+        return delay if delay > 0 else deadline - now
+
+    def _record_sent(self, priority: int) -> None:
+        self._last_sent = time.time()
+        if self.remaining is not None:
+            self.remaining -= 1
+        self.sent[priority] += 1
+
+    def acquire(self, priority: int) -> None:
+        """
+        Block until a request of this priority may be sent.
+        Lower priorities also wait while a higher priority request is queued.
+        """
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                deadline = time.time() + self.max_wait
+                delayed = False
+                while (timeout := self._wait_time(priority, deadline)) is not None:
+                    if not delayed:
+                        delayed = True
+                        self.throttled += 1
+                    self._cond.wait(timeout=timeout)
+
+                self._record_sent(priority)
+            finally:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+
+    def update(self, response) -> None:
+        """
+        Record the budget reported by a response.
+        """
+        headers = response.headers
+        if headers.get("X-RateLimit-Resource", self.resource) != self.resource:
+            return
+
+        now = time.time()
+        with self._cond:
+            if "X-RateLimit-Remaining" in headers:
+                self.remaining = int(headers["X-RateLimit-Remaining"])
+                self.limit = int(headers.get("X-RateLimit-Limit", self.limit or 0)) or None
+                reset = headers.get("X-RateLimit-Reset")
+                self.reset_at = float(reset) if reset else None
+
+            if response.status_code in (403, 429):
+                retry_after = headers.get("Retry-After")
+                if retry_after:
+                    self.blocked_until = now + float(retry_after)
+                elif self.remaining == 0 and self.reset_at:
+                    self.blocked_until = self.reset_at
+
+            self._cond.notify_all()
+
+    def is_rate_limited(self, response) -> bool:
+        return response.status_code in (403, 429) and (
+            "Retry-After" in response.headers or response.headers.get("X-RateLimit-Remaining") == "0"
+        )
+
+    def budget(self) -> dict:
+        """
+        Current budget state, for logging and monitoring.
+        """
+        with self._cond:
+            return {
+                "resource": self.resource,
+                "limit": self.limit,
+                "remaining": self.remaining,
+                "reset_at": self.reset_at,
+                "blocked_until": self.blocked_until if self.blocked_until > time.time() else None,
+                "sent": dict(zip(_PRIORITY_NAMES, self.sent)),
+                "throttled": self.throttled,
+            }
+
+
+class RawContentCache:
+    """
+    On disk cache of raw_url downloads, one file per url.
+
+    A raw_url embeds the revision it serves, so an entry never goes stale and
+    only new revisions need a download. Least recently used entries are evicted
+    once the cache grows past max_bytes.
+    """
+
+    # Entries are named by the sha256 of their url, anything else in the
+    # directory is left alone
+    _ENTRY_NAME = re.compile(r"[0-9a-f]{64}")
+    _TMP_NAME = re.compile(r"[0-9a-f]{64}\.\d+\.tmp")
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024):
+        """
+        :param directory: Where the entries live, created if missing
+        :param max_bytes: Size bound of all entries together
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # file name -> size, least recently used first
+        self._size = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        """
+        Pick up entries of a previous run, in last use (mtime) order, and drop
+        the partial writes it left behind.
+        """
+        found = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if self._TMP_NAME.fullmatch(entry.name):
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+                    continue
+                if not self._ENTRY_NAME.fullmatch(entry.name) or not entry.is_file():
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                found.append((stat.st_mtime, entry.name, stat.st_size))
+
+        for _, name, size in sorted(found):
+            self._entries[name] = size
+            self._size += size
+        self._evict()
+
+    @staticmethod
+    def _name(raw_url: str) -> str:
+        return hashlib.sha256(raw_url.encode()).hexdigest()
+
+    def get(self, raw_url: str) -> Optional[str]:
+        name = self._name(raw_url)
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            if name not in self._entries:
+                self.misses += 1
+                return None
+
+            try:
+                with open(path, "rb") as f:
+                    content = f.read().decode()
+                os.utime(path)  # remember the use across restarts
+            except OSError:
+                self._size -= self._entries.pop(name)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(name)
+            self.hits += 1
+            return content
+
+    def put(self, raw_url: str, content: str) -> None:
+        name = self._name(raw_url)
+        path = os.path.join(self.directory, name)
+        data = content.encode()
+        if len(data) > self.max_bytes:
+            return
+
+        with self._lock:
+            # Write then rename, so a crash never leaves a truncated entry behind
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError:
+                return
+
+            self._size -= self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            self._size += len(data)
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._size -= size
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._size, "hits": self.hits, "misses": self.misses}
+
+
+# Owner by owner gist listing with the contents inline, one aliased user() per owner.
+# GraphQL has no global gist feed, so full feed scans stay on REST.
+_GRAPHQL_OWNER = """
+  {alias}: user(login: ${alias}_login) {{
+    gists(first: 100, after: ${alias}_after, orderBy: {{field: UPDATED_AT, direction: DESC}}) {{
+      pageInfo {{ hasNextPage endCursor }}
+      nodes {{ name description updatedAt owner {{ login }} files {{ name text size }} }}
+    }}
+  }}"""
 
 
 class GitHubGistUserStore:
@@ -12,6 +321,10 @@ class GitHubGistUserStore:
         group_name: str,
         gist_id: Optional[str] = None,
         public: bool = False,
+        max_workers: int = 16,
+        base_url: str = "https://api.github.com",
+        graphql: bool = False,
+        raw_cache: Optional[RawContentCache] = None,
     ):
         """
         :param token: GitHub personal access token
@@ -19,13 +332,18 @@ class GitHubGistUserStore:
         :param group: Group name stored in gist description
         :param gist_id: Existing gist ID (optional)
         :param public: Whether created gists should be public
+        :param max_workers: Max concurrent content downloads (and pooled connections)
+        :param base_url: API root, point it at a local stand-in (see local_store) for testing
+        :param graphql: Fetch members' posts through batched GraphQL queries that carry the
+                        contents, instead of one listing per owner plus one download per post
+        :param raw_cache: On disk cache of raw_url downloads (optional)
         """
         self.owner = owner
         self.group = group_name
         self.gist_id = gist_id
         self.public = public
 
-        self.BASE_URL = "https://api.github.com"
+        self.BASE_URL = base_url.rstrip("/")
         self.FILENAME = "user_data.txt"
 
 
@@ -35,6 +353,38 @@ class GitHubGistUserStore:
             "Accept": "application/vnd.github+json",
         })
 
+        # Size the connection pool to the fetch pool so parallel downloads keep their connections alive
+        self.max_workers = max_workers
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._executor = None
+
+        # (url, params) -> (etag, parsed json body) of the last 200 response
+        self._etag_cache = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        # updated_at high-water mark of the last listing, for incremental polls
+        self.since_cursor: Optional[str] = None
+
+        self.scheduler = RateLimitScheduler()
+        # GraphQL has its own budget, and running it out must not block our REST upserts
+        self.graphql_scheduler = RateLimitScheduler(resource="graphql")
+
+        # Pages of the last full and incremental feed listings, to price a scan
+        self.feed_pages: Optional[int] = None
+        self.changed_pages: Optional[int] = None
+        # Targeted fetches are only tried for at most this many owners while the feed size is unknown
+        self.targeted_max_owners = 30
+        # Strategy and cost of the last get_changed_gists_for_owners call
+        self.last_fetch: Optional[dict] = None
+
+        self.graphql = graphql
+        self.graphql_owners_per_query = 50
+
+        self.raw_cache = raw_cache
+
     # -------------------------
     # Internal helpers
     # -------------------------
@@ -42,19 +392,219 @@ class GitHubGistUserStore:
     def _description(self) -> str:
         return f"[group:{self.group}]-[owner:{self.owner}]"
 
+    def _request(
+        self,
+        method: str,
+        url: str,
+        priority: int,
+        scheduler: Optional[RateLimitScheduler] = None,
+        **kwargs,
+    ) -> requests.Response:
+        """
+        Send an API request once the rate limit scheduler allows it.
+
+        :param scheduler: Scheduler of the budget the request is charged to, `scheduler` (REST) by default
+        """
+        scheduler = scheduler or self.scheduler
+        scheduler.acquire(priority)
+        response = self.session.request(method, url, **kwargs)
+        scheduler.update(response)
+
+        if scheduler.is_rate_limited(response):
+            raise RateLimitExceeded(f"{method} {url} was rate limited: {scheduler.budget()}")
+        return response
+
+    def _get_json(self, url: str, params: Optional[dict] = None, priority: int = PRIORITY_SCAN):
+        """
+        GET a JSON resource with a conditional request.
+
+        The ETag and body of every 200 response are kept, and sent back as
+        If-None-Match on the next request for the same url/params. A 304
+        reuses the cached body (and does not count against GitHub's rate limit).
+        """
+        cache_key = (url, tuple(sorted((params or {}).items())))
+        cached = self._etag_cache.get(cache_key)
+
+        headers = {}
+        if cached is not None:
+            headers["If-None-Match"] = cached[0]
+
+        response = self._request("GET", url, priority, params=params, headers=headers)
+
+        if response.status_code == 304 and cached is not None:
+            self.cache_hits += 1
+            return cached[1]
+
+        response.raise_for_status()
+        self.cache_misses += 1
+
+        body = response.json()
+        etag = response.headers.get("ETag")
+        if etag:
+            self._etag_cache[cache_key] = (etag, body)
+        else:
+            self._etag_cache.pop(cache_key, None)
+        return body
+
+    def _fetch_raw(self, raw_url: str) -> str:
+        if self.raw_cache is not None:
+            content = self.raw_cache.get(raw_url)
+            if content is not None:
+                return content
+
+        # raw_urls are served outside the API and do not count against the rate limit
+        resp = self.session.get(raw_url)
+        resp.raise_for_status()
+
+        if self.raw_cache is not None:
+            self.raw_cache.put(raw_url, resp.text)
+        return resp.text
+
+    def _map_concurrent(self, fn, items: list) -> list:
+        """
+        Run fn over items on the fetch pool, results in the same order as items.
+        """
+        if len(items) <= 1:
+            return [fn(item) for item in items]
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return list(self._executor.map(fn, items))
+
+    def _imap_completed(self, fn, items: list) -> Iterator[list]:
+        """
+        Run fn over items on the fetch pool, yielding the results of everything that
+        finished since the previous yield (in no particular order). Results that
+        complete together stay together, so whatever is done with each batch next
+        (downloads, verification) still gets whole batches to parallelise.
+        """
+        if len(items) <= 1:
+            if items:
+                yield [fn(items[0])]
+            return
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        pending = {self._executor.submit(fn, item) for item in items}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            yield [future.result() for future in done]
+
+    def _list_gists(self, since: Optional[str] = None) -> List[dict]:
+        """
+        Walk every page of the gist listing, optionally only gists updated since `since`.
+        """
+        return [gist for page_gists in self._iter_gist_pages(since) for gist in page_gists]
+
+    def _iter_gist_pages(self, since: Optional[str] = None) -> Iterator[List[dict]]:
+        """
+        Yield the gist listing page by page, as each page arrives.
+        """
+        page = 1
+        while True:
+            params = {"per_page": 30, "page": page}
+            if since:
+                params["since"] = since
+
+            priority = PRIORITY_CHANGED if since else PRIORITY_SCAN
+            page_gists = self._get_json(f"{self.BASE_URL}/gists", params=params, priority=priority)
+
+            if not page_gists:
+                break
+
+            yield page_gists
+
+            # A short page is the last one, no need to ask for an empty page
+            if len(page_gists) < params["per_page"]:
+                break
+            page += 1
+
+        if since:
+            self.changed_pages = page
+        else:
+            self.feed_pages = page
+
+    def _list_owner_gists(self, owner: str) -> List[dict]:
+        """
+        Walk every page of one owner's gists.
+        """
+        gists = []
+        page = 1
+        while True:
+            params = {"per_page": 100, "page": page}
+            page_gists = self._get_json(f"{self.BASE_URL}/users/{owner}/gists", params=params)
+
+            if not page_gists:
+                break
+
+            gists.extend(page_gists)
+
+            if len(page_gists) < params["per_page"]:
+                break
+            page += 1
+
+        return gists
+
+    def _list_owner_posts(self, owner: str, group: str) -> List[dict]:
+        """
+        One owner's posts in group with their contents filled in, as one pooled
+        task, so the downloads of many owners overlap like their listings do.
+        """
+        gists = index_posts(self._list_owner_gists(owner), group).get(owner, [])
+
+        # Downloaded right here, this already runs on the fetch pool
+        contents, pending = _split_contents(gists)
+        _fill_contents(contents, pending, [self._fetch_raw(raw_url) for _, _, raw_url in pending])
+        return _with_contents(gists, contents)
+
+    def _graphql(self, query: str, variables: dict) -> dict:
+        """
+        Run a GraphQL query, returns its data. Missing users come back as None.
+        """
+        response = self._request(
+            "POST", f"{self.BASE_URL}/graphql", PRIORITY_SCAN,
+            scheduler=self.graphql_scheduler,
+            json={"query": query, "variables": variables},
+        )
+        response.raise_for_status()
+
+        body = response.json()
+        errors = [error for error in body.get("errors") or [] if error.get("type") != "NOT_FOUND"]
+        if errors or body.get("data") is None:
+            raise RuntimeError(f"GraphQL query failed: {errors or body}")
+        return body["data"]
+
+    def _list_owners_gists_graphql(self, owners: List[str]) -> List[dict]:
+        """
+        Every gist of every owner, contents included, graphql_owners_per_query owners
+        per query. Owners with more than 100 gists are followed up by cursor in later queries.
+        """
+        return [gist for batch_gists in self._iter_owners_gists_graphql(owners) for gist in batch_gists]
+
+    def _iter_owners_gists_graphql(self, owners: List[str]) -> Iterator[List[dict]]:
+        """
+        Yield the gists of _list_owners_gists_graphql query by query.
+        """
+        pending = [(owner, None) for owner in owners]  # (owner, cursor)
+        while pending:
+            batch = pending[:self.graphql_owners_per_query]
+            pending = pending[self.graphql_owners_per_query:]
+
+            data = self._graphql(*_graphql_owners_query(batch))
+
+            gists, follow_ups = _graphql_owners_gists(data, batch)
+            pending.extend(follow_ups)
+            yield gists
+
     def _create_gist(self, content: str) -> str:
-        payload = {
-            "description": self._description(),
-            "public": self.public,
-            "files": {
-                self.FILENAME: {
-                    "content": content
-                }
-            }
-        }
+        payload = _gist_payload(self._description(), self.FILENAME, content)
+        payload["public"] = self.public
 
-        response = self.session.post(
+        response = self._request(
+            "POST",
             f"{self.BASE_URL}/gists",
+            PRIORITY_UPSERT,
             json=payload
         )
         response.raise_for_status()
@@ -67,19 +617,18 @@ class GitHubGistUserStore:
         if not self.gist_id:
             raise RuntimeError("Cannot update gist without gist_id")
 
-        payload = {
-            "description": self._description(),
-            "files": {
-                self.FILENAME: {
-                    "content": content
-                }
-            }
-        }
+        payload = _gist_payload(self._description(), self.FILENAME, content)
 
-        response = self.session.patch(
+        response = self._request(
+            "PATCH",
             f"{self.BASE_URL}/gists/{self.gist_id}",
+            PRIORITY_UPSERT,
             json=payload
         )
+        if response.status_code == 404:
+            # Deleted behind our back, let upsert_user create a new one
+            self.gist_id = None
+            return
         response.raise_for_status()
 
     # -------------------------
@@ -95,12 +644,43 @@ class GitHubGistUserStore:
 
         :return: gist_id
         """
+        if self.gist_id is not None:
+            self._update_gist(content)
+
         if self.gist_id is None:
             return self._create_gist(content)
 
-        self._update_gist(content)
         return self.gist_id
 
+    def find_own_gist_id(self) -> Optional[str]:
+        """
+        Look up the id of our post for this group in the owner's gists,
+        so a restart can update it instead of creating a new one.
+
+        Only looks at the owner's first 100 gists (one request).
+        """
+        owner_gists = self._get_json(
+            f"{self.BASE_URL}/users/{self.owner}/gists",
+            params={"per_page": 100, "page": 1},
+            priority=PRIORITY_UPSERT,
+        )
+
+        # Newest first, so this picks the most recently updated post
+        for gist in owner_gists:
+            if gist.get("description") == self._description() and self.FILENAME in gist.get("files", {}):
+                return gist["id"]
+        return None
+
+    def delete_gist(self, gist_id: str) -> None:
+        """
+        Delete a gist (only works for gists owned by the token's user).
+        """
+        response = self._request("DELETE", f"{self.BASE_URL}/gists/{gist_id}", PRIORITY_UPSERT)
+        response.raise_for_status()
+
+        if gist_id == self.gist_id:
+            self.gist_id = None
+
     def get_user_content(self) -> str:
         """
         Fetch the contents of this user's gist.
@@ -108,12 +688,9 @@ class GitHubGistUserStore:
         if not self.gist_id:
             raise RuntimeError("No gist_id set on this instance")
 
-        response = self.session.get(
-            f"{self.BASE_URL}/gists/{self.gist_id}"
-        )
-        response.raise_for_status()
+        gist = self._get_json(f"{self.BASE_URL}/gists/{self.gist_id}", priority=PRIORITY_UPSERT)
 
-        files = response.json()["files"]
+        files = gist["files"]
         return files[self.FILENAME]["content"]
 
     def get_group_users(self) -> List[dict]:
@@ -121,23 +698,9 @@ class GitHubGistUserStore:
         Get all gists that have this group name in their description, and contain the expected filename.
         """
         gists = []
-        page = 1
-        while True:
-            response = self.session.get(
-                f"{self.BASE_URL}/gists",
-                params={"per_page": 30, "page": page}
-            )
-            response.raise_for_status()
-            page_gists = response.json()
-
-            if not page_gists:
-                break
-
-            for gist in page_gists:
-                if self._description() in gist.get("description", "") and self.FILENAME in gist.get("files", {}):
-                    gists.append(gist)
-
-            page += 1
+        for gist in self._list_gists():
+            if gist.get("description") == self._description() and self.FILENAME in gist.get("files", {}):
+                gists.append(gist)
 
         return gists
 
@@ -147,68 +710,106 @@ class GitHubGistUserStore:
         """
         contents = []
 
-        for gist in self.get_group_users():
-            files = gist.get("files", {})
-            if self.FILENAME in files:
-                file_obj = files[self.FILENAME]
-                content = file_obj.get("content")
-                if content is None:
-                    # Fetch via raw_url if content is not available
-                    raw_url = file_obj.get("raw_url")
-                    if raw_url:
-                        resp = self.session.get(raw_url)
-                        resp.raise_for_status()
-                        content = resp.text
-                if content is not None:
-                    contents.append(content)
+        for gist_contents in self.get_gists_contents(self.get_group_users()):
+            content = gist_contents.get(self.FILENAME)
+            if content is not None:
+                contents.append(content)
 
         return contents
 
 
-    def get_gists_by_key_discription(self, key: str) -> List[dict]:
+    def get_gists_by_key_discription(self, key: str, since: Optional[str] = None) -> List[dict]:
         """
-        Get all gists that have a specific key in their description.
+        Get all posts of group `key` (exact match on the parsed description, so
+        "net" does not pick up "net-staging").
+
+        :param since: only list gists updated at or after this ISO 8601 time
         """
-        gists = []
-        page = 1
-        while True:
-            response = self.session.get(
-                f"{self.BASE_URL}/gists",
-                params={"per_page": 30, "page": page}
-            )
-            response.raise_for_status()
-            page_gists = response.json()
+        return group_posts(self._list_gists(since), key)
 
-            if not page_gists:
-                break
+    def get_changed_gists_by_key_discription(self, key: str, full: bool = False) -> List[dict]:
+        """
+        Incremental variant of get_gists_by_key_discription.
 
-            for gist in page_gists:
-                if key in gist.get("description", ""):
-                    gists.append(gist)
+        Only asks for gists updated at or after `since_cursor`, then moves the
+        cursor to the newest updated_at seen. With `full=True` (or before the
+        first call) every page is walked and the cursor is reset from scratch.
+        Deleted gists never show up in an incremental listing, so callers
+        should do a full pass now and then.
+        """
+        return [gist for page_gists in self.iter_changed_gists_by_key_discription(key, full) for gist in page_gists]
 
-            page += 1
+    def iter_changed_gists_by_key_discription(self, key: str, full: bool = False) -> Iterator[List[dict]]:
+        """
+        Streaming get_changed_gists_by_key_discription: yields the matches page by page,
+        as each page arrives. The cursor only moves once the listing is walked to the end.
+        """
+        since = None if full else self.since_cursor
 
-        return gists
+        newest = since
+        for page_gists in self._iter_gist_pages(since):
+            gists, newest = _changed_page(page_gists, key, newest)
+            yield gists
+
+        _advance_since(self, newest)
     
 
 
+    def get_changed_gists_for_owners(self, key: str, owners: List[str], full: bool = False) -> List[dict]:
+        """
+        Gists of group `key` (exact match on the parsed description) owned by one of owners.
+
+        When there are fewer owners than pages to scan, every owner's gists are
+        listed directly from /users/{owner}/gists, in parallel, or with `graphql`
+        from batched GraphQL queries that also carry the contents. That listing is
+        complete for those owners (not incremental). Otherwise this is
+        get_changed_gists_by_key_discription filtered by owner.
+
+        The strategy and what it cost are recorded in `last_fetch`; its
+        "complete" entry says whether gists missing from the result were deleted.
+        """
+        return [gist for batch_gists in self.iter_changed_gists_for_owners(key, owners, full) for gist in batch_gists]
+
+    def iter_changed_gists_for_owners(self, key: str, owners: List[str], full: bool = False) -> Iterator[List[dict]]:
+        """
+        Streaming get_changed_gists_for_owners: yields the matches of each page (or
+        owner, or GraphQL query) as soon as it arrives. `last_fetch` is recorded once
+        the listing is walked to the end.
+        """
+        fetch = _OwnerFetch(self, key, owners, full)
+
+        if fetch.strategy == "targeted":
+            batches = (
+                [gist for owner_gists in finished for gist in owner_gists]
+                for finished in self._imap_completed(lambda owner: self._list_owner_posts(owner, key), fetch.owners)
+            )
+        elif fetch.strategy == "graphql":
+            batches = self._iter_owners_gists_graphql(fetch.owners)
+        else:
+            batches = self.iter_changed_gists_by_key_discription(key, full=full)
+
+        for batch in batches:
+            yield fetch.matches(batch)
+
+        self.last_fetch = fetch.summary()
+
     def get_gist_contents(self, gist: dict) -> dict:
         """
         Fetch the contents of a specific gist.
         """
 
-        files = gist.get("files", {})
-        contents = {}
-        for self.FILENAME, file_obj in files.items():
-            content = file_obj.get("content")
-            if content is None:
-                # Fetch via raw_url if content is not available
-                raw_url = file_obj.get("raw_url")
-                if raw_url:
-                    resp = self.session.get(raw_url)
-                    resp.raise_for_status()
-                    content = resp.text
-            contents[self.FILENAME] = content
+        return self.get_gists_contents([gist])[0]
+
+    def get_gists_contents(self, gists: List[dict]) -> List[dict]:
+        """
+        Fetch the contents of many gists, downloading the raw_urls concurrently
+        (those not already in raw_cache).
+
+        :return: one {filename: content} dict per gist, in the same order as gists
+        """
+        contents, pending = _split_contents(gists)
+        fetched = self._map_concurrent(self._fetch_raw, [raw_url for _, _, raw_url in pending])
+        _fill_contents(contents, pending, fetched)
         return contents
     
 
@@ -221,6 +822,227 @@ class GitHubGistUserStore:
 
 
 
+def _graphql_gist(node: dict) -> dict:
+    """
+    A GraphQL gist node in the shape of a REST gist (with the contents filled in).
+    """
+    return {
+        "id": node["name"],
+        "description": node.get("description") or "",
+        "updated_at": node.get("updatedAt"),
+        "owner": {"login": (node.get("owner") or {}).get("login")},
+        "files": {
+            file_obj["name"]: {
+                "filename": file_obj["name"],
+                "content": file_obj.get("text"),
+                "size": file_obj.get("size", 0),
+            }
+            for file_obj in node.get("files") or []
+        },
+    }
+
+
+# -------------------------
+# Shared by GitHubGistUserStore and async_gist_wrapper.AsyncGitHubGistUserStore,
+# everything here is bookkeeping only, the stores do the IO
+# -------------------------
+
+def _gist_payload(description: str, filename: str, content: str) -> dict:
+    return {
+        "description": description,
+        "files": {
+            filename: {
+                "content": content
+            }
+        }
+    }
+
+
+def _graphql_owners_query(batch: list) -> tuple:
+    """
+    (query, variables) listing the gists of a batch of (owner, cursor), one aliased user() each.
+    """
+    declarations = []
+    fields = []
+    variables = {}
+    for i, (owner, cursor) in enumerate(batch):
+        alias = f"u{i}"
+        declarations.append(f"${alias}_login: String!, ${alias}_after: String")
+        fields.append(_GRAPHQL_OWNER.format(alias=alias))
+        variables[f"{alias}_login"] = owner
+        variables[f"{alias}_after"] = cursor
+
+    query = f"query({', '.join(declarations)}) {{{''.join(fields)}\n}}"
+    return query, variables
+
+
+def _graphql_owners_gists(data: dict, batch: list) -> tuple:
+    """
+    The gists in the answer to _graphql_owners_query(batch), plus the (owner, cursor)
+    of every owner with more gists to fetch.
+    """
+    gists = []
+    follow_ups = []
+    for i, (owner, _) in enumerate(batch):
+        user = data.get(f"u{i}")
+        if user is None:
+            continue
+        connection = user["gists"]
+        gists.extend(_graphql_gist(node) for node in connection["nodes"])
+        if connection["pageInfo"]["hasNextPage"]:
+            follow_ups.append((owner, connection["pageInfo"]["endCursor"]))
+    return gists, follow_ups
+
+
+def _choose_fetch_strategy(store, owners: int, full: bool) -> tuple:
+    """
+    Pick the cheaper of a targeted fetch (about one request per owner, or one
+    GraphQL query per graphql_owners_per_query owners) and a feed scan (priced
+    by the page count of the last scan of the same kind).
+
+    :return: (strategy, estimated targeted requests, estimated scan requests or None if unknown)
+    """
+    scan_cost = store.feed_pages if full or store.since_cursor is None else store.changed_pages
+
+    if store.graphql:
+        # Also saves the content downloads a scan would need, so it wins ties
+        targeted_cost = math.ceil(owners / store.graphql_owners_per_query)
+        cheaper = scan_cost is None or targeted_cost <= scan_cost
+        return "graphql" if cheaper else "scan", targeted_cost, scan_cost
+
+    if scan_cost is None:
+        # Never scanned: the feed may be huge, so only a small member set is safe to target
+        strategy = "targeted" if owners <= store.targeted_max_owners else "scan"
+    else:
+        strategy = "targeted" if owners < scan_cost else "scan"
+    return strategy, owners, scan_cost
+
+
+def _changed_page(page_gists: List[dict], key: str, newest: Optional[str]) -> tuple:
+    """
+    The gists of a page with key in their description, and the newest updated_at seen so far.
+    """
+    gists = []
+    for gist in page_gists:
+        updated_at = gist.get("updated_at")
+        if updated_at and (newest is None or updated_at > newest):
+            newest = updated_at
+        if key in gist.get("description", ""):
+            gists.append(gist)
+    return gists, newest
+
+
+def _advance_since(store, newest: Optional[str]) -> None:
+    """
+    Move the since cursor of a store, dropping the cached pages of the old one.
+    """
+    if newest == store.since_cursor:
+        return
+    if store.since_cursor is not None:
+        for cache_key in list(store._etag_cache):
+            if ("since", store.since_cursor) in cache_key[1]:
+                del store._etag_cache[cache_key]
+    store.since_cursor = newest
+
+
+def _split_contents(gists: List[dict]) -> tuple:
+    """
+    One {filename: content} dict per gist with the contents the listing carried, and
+    the (gist index, filename, raw_url) of every file whose content must be downloaded.
+    """
+    pending = []
+    results = []
+    for i, gist in enumerate(gists):
+        contents = {}
+        for filename, file_obj in gist.get("files", {}).items():
+            content = file_obj.get("content")
+            if content is None:
+                # Fetch via raw_url if content is not available
+                raw_url = file_obj.get("raw_url")
+                if raw_url:
+                    pending.append((i, filename, raw_url))
+            contents[filename] = content
+        results.append(contents)
+    return results, pending
+
+
+def _fill_contents(results: List[dict], pending: list, fetched: list) -> None:
+    for (i, filename, _), content in zip(pending, fetched):
+        results[i][filename] = content
+
+
+def _with_contents(gists: List[dict], contents: List[dict]) -> List[dict]:
+    """
+    Copies of gists with their file contents filled in, the listing itself stays
+    in the ETag cache as GitHub sent it.
+    """
+    posts = []
+    for gist, gist_contents in zip(gists, contents):
+        files = {
+            filename: dict(file_obj, content=gist_contents.get(filename))
+            for filename, file_obj in gist.get("files", {}).items()
+        }
+        posts.append(dict(gist, files=files))
+    return posts
+
+
+class _OwnerFetch:
+    """
+    Bookkeeping of one iter_changed_gists_for_owners run: the strategy, the owner
+    filter of every batch and the `last_fetch` record.
+    """
+
+    def __init__(self, store, key: str, owners: List[str], full: bool):
+        self.store = store
+        self.key = key
+        self.owners = sorted(set(owners))
+        self._owner_set = set(self.owners)
+
+        self.strategy, self.targeted_estimate, self.scan_estimate = _choose_fetch_strategy(
+            store, len(self.owners), full
+        )
+        self.complete = self.strategy != "scan" or full or store.since_cursor is None
+
+        self._sent_before = self._sent()
+        self._hits_before = store.cache_hits
+        self.start = time.time()
+
+        self.listed = 0
+        self.matched = 0
+        self.first_batch_seconds = None
+
+    def _sent(self) -> int:
+        return sum(self.store.scheduler.sent) + sum(self.store.graphql_scheduler.sent)
+
+    def matches(self, batch: List[dict]) -> List[dict]:
+        """
+        The posts of a listed batch that belong to one of the owners.
+        """
+        index = index_posts(batch, self.key)
+        gists = [gist for owner in index if owner in self._owner_set for gist in index[owner]]
+
+        self.listed += len(batch)
+        self.matched += len(gists)
+        if self.first_batch_seconds is None:
+            self.first_batch_seconds = time.time() - self.start
+        return gists
+
+    def summary(self) -> dict:
+        return {
+            "strategy": self.strategy,
+            "complete": self.complete,
+            "owners": len(self.owners),
+            "estimated_targeted_requests": self.targeted_estimate,
+            "estimated_scan_requests": self.scan_estimate,
+            "requests": self._sent() - self._sent_before,
+            "not_modified": self.store.cache_hits - self._hits_before,
+            "gists_listed": self.listed,
+            "gists_matched": self.matched,
+            "first_batch_seconds": self.first_batch_seconds,
+            "seconds": time.time() - self.start,
+        }
+
+
 ##tests
 
 
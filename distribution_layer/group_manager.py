@@ -1,13 +1,18 @@
 from distribution_layer import postMaker
 from distribution_layer import gist_wrapper
 from distribution_layer import rsa_enryption as rsa
+from distribution_layer import blake2b_wrapper as blake
+from distribution_layer.rendezvous_backend import RendezvousBackend, index_posts
+from typing import Optional, Iterator
+from datetime import datetime, timedelta, timezone
 
 # For robust public-key comparisons
 import hashlib
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.backends import default_backend
 import base64
-from cryptography.hazmat.primitives.asymmetric import rsa as crypto_rsa
+from functools import lru_cache
+import inspect
 
 
 class Group:
@@ -20,138 +25,455 @@ class Group:
         group_key: bytes,
         key_pair: tuple[bytes, bytes],
         public: bool = False,
+        store: Optional[RendezvousBackend] = None,
+        gist_id: Optional[str] = None,
+        post_cache_path: Optional[str] = None,
+        accepted_group_keys: Optional[list[bytes]] = None,
+        graphql: bool = False,
+        raw_cache_path: Optional[str] = None,
+        post_format: str = postMaker.FORMAT_JSON,
     ):
-        self.gist_wrapper = gist_wrapper.GitHubGistUserStore(
-            token=token,
-            owner=owner,
-            group_name=group,
-            public=public,
-            gist_id=None
-        )
+        """
+        :param store: Rendezvous backend to post to and read from,
+                      defaults to GitHub gists (gist_wrapper.GitHubGistUserStore)
+        :param gist_id: Id of our existing post (from the config), updated in place
+        :param post_cache_path: File to persist verified posts in across restarts (optional)
+        :param accepted_group_keys: Other group keys members may still post with, during a
+                                    rotation (we always post with group_key)
+        :param graphql: Read members' posts through batched GraphQL queries (default store only)
+        :param raw_cache_path: Directory to keep downloaded post contents in across restarts
+                               (default store only, optional)
+        :param post_format: Encoding of our own post (postMaker.FORMAT_JSON or FORMAT_COMPACT),
+                            switch to compact once every member runs a client that reads it
+        """
+        if store is None:
+            store = gist_wrapper.GitHubGistUserStore(
+                token=token,
+                owner=owner,
+                group_name=group,
+                public=public,
+                gist_id=gist_id,
+                graphql=graphql,
+                raw_cache=gist_wrapper.RawContentCache(raw_cache_path) if raw_cache_path else None
+            )
+        elif inspect.iscoroutinefunction(store.upsert_user):
+            # e.g. async_gist_wrapper.AsyncGitHubGistUserStore, same names but coroutines
+            raise TypeError("Group needs a synchronous RendezvousBackend, not an async store")
+        elif gist_id is not None:
+            store.gist_id = gist_id
+        self.gist_wrapper = store
 
         self.username = owner
 
         self.group_name = group
         self.group_key = group_key
+        self.keyring = blake.GroupKeyring(group_key, accepted_group_keys or ())
         self.key_pair = key_pair
-
-    def create_and_post(self, endpoint: str, wg_pk: str):
+        self.post_format = post_format
+
+        # gist id -> verified post, kept up to date by incremental polls
+        self.member_table = {}
+        self._member_revisions = {}  # gist id -> _revision() of the post in member_table
+        self.full_scan_every = 20
+        self._polls_since_full_scan = None
+        # Listed / kept counts of the last poll's description pre-filter
+        self.last_prefilter = None
+
+        # Payload (minus issued_at) of our current post, to skip no-op updates
+        self._posted_payload = None
+
+        # Posts already decrypted and verified, by content hash
+        self.post_cache = postMaker.PostCache(path=post_cache_path)
+
+        # Known members by (name, key fingerprint), see _member_index
+        self._member_index_key = None
+        self._known_members_index = {}
+        self._known_member_names = set()
+
+        # sender key id -> PEM public key of every known member and ourselves,
+        # posts from anyone else are dropped before any crypto
+        self._own_keys = {postMaker.sender_key_id(key_pair[1]): key_pair[1]}
+        self.known_keys = dict(self._own_keys)
+
+    def find_own_post(self) -> Optional[str]:
+        """
+        Make sure we know the id of our post, with one owner scoped lookup if
+        none was configured. Returns the id, or None if we have not posted yet.
+        """
+        if self.gist_wrapper.gist_id is None:
+            self.gist_wrapper.gist_id = self.gist_wrapper.find_own_gist_id()
+        return self.gist_wrapper.gist_id
+
+    def create_and_post(self, endpoint: str, wg_pk: str) -> str:
+        """
+        Post our endpoint, updating our existing post in place.
+        Nothing is sent if the existing post already says the same thing.
+
+        :return: id of our post
+        """
         payload = postMaker.create_payload(endpoint, self.username, wg_pk)
-        post = postMaker.create_post(self.key_pair, self.group_key, payload)
-        id = self.gist_wrapper.upsert_user(post)
 
+        if self.gist_wrapper.gist_id is not None:
+            if self._posted_payload is None:
+                self._posted_payload = self._read_own_post()
+            if self._posted_payload == _logical_payload(payload):
+                return self.gist_wrapper.gist_id
 
-    def get_members(self) -> list[dict]:
-        members = []
+        post = postMaker.create_post(self.key_pair, self.group_key, payload, post_format=self.post_format)
+        id = self.gist_wrapper.upsert_user(post)
+        self._posted_payload = _logical_payload(payload)
+        return id
+
+    def _read_own_post(self) -> Optional[dict]:
+        """
+        Logical payload of the post currently behind our gist_id, None if it
+        is missing, unreadable (e.g. posted with another group key) or not in
+        our post_format.
+        """
+        try:
+            content = self.gist_wrapper.get_user_content()
+        except Exception:
+            return None
+
+        is_compact = content.startswith(postMaker.COMPACT_PREFIX)
+        if is_compact != (self.post_format == postMaker.FORMAT_COMPACT):
+            return None
+
+        post_data = postMaker.read_post(content, self.group_key, known_keys=self._own_keys)
+        if post_data is None:
+            return None
+        return _logical_payload(post_data["payload"])
+
+
+    def accept_group_key(self, group_key: bytes) -> None:
+        """
+        Also read posts made with group_key, e.g. the next key before we switch to it.
+        """
+        if group_key not in self.keyring:
+            self.keyring.add(group_key)
+            # Posts with this key were dropped unread so far
+            self._polls_since_full_scan = None
+
+    def rotate_group_key(self, group_key: bytes) -> None:
+        """
+        Post with group_key from now on. The previous key stays accepted, so members
+        that have not rotated yet are still read, until retire_group_key.
+        The next create_and_post re-posts under the new key.
+        """
+        self.accept_group_key(group_key)
+        self.keyring.set_current(group_key)
+        self.group_key = group_key
+        self._posted_payload = None
+
+    def retire_group_key(self, group_key: bytes) -> None:
+        """
+        Stop reading posts made with group_key, and forget the members we only know from them.
+        """
+        self.keyring.remove(group_key)
+        key_id = blake.group_key_id(group_key).hex()
+        for id, post_data in list(self.member_table.items()):
+            if post_data.get("group_key_id") == key_id:
+                del self.member_table[id]
+                self._member_revisions.pop(id, None)
+
+    def group_key_usage(self) -> dict:
+        """
+        Group key id (hex) -> number of members whose current post uses it,
+        to tell when everyone has moved to a new key and the old one can be retired.
+        """
+        usage = {blake.group_key_id(key).hex(): 0 for key in self.keyring.keys()}
+        for post_data in self.member_table.values():
+            key_id = post_data.get("group_key_id")
+            if key_id is not None:
+                usage[key_id] = usage.get(key_id, 0) + 1
+        return usage
+
+    def collect_garbage(self, max_deletes: int = 10, max_age: Optional[timedelta] = None) -> dict:
+        """
+        Delete our own superseded or expired posts, at most max_deletes per call.
+
+        Our posts are the ones under our group/owner description, owned by us
+        and signed with our key. The current one (gist_id, or else the newest by
+        issued_at, as in find_newest_post) is kept and every other one is
+        superseded. When we have no live post (gist_id is None), max_age also
+        expires the newest one if it was issued longer ago than that.
+
+        :return: report with what was deleted and what each future full scan saves
+        """
+        own_gists = [
+            gist for gist in self.gist_wrapper.get_group_users()
+            if gist.get("owner", {}).get("login") in (None, self.username)
+        ]
+        contents = self.gist_wrapper.get_gists_contents(own_gists)
+
+        infos = [gist_contents.get('user_data.txt') for gist_contents in contents]
+        posts_data = postMaker.read_posts(infos, self.keyring, cache=self.post_cache, known_keys=self._own_keys)
+
+        own_posts = []  # (gist, issued_at)
+        for gist, post_data in zip(own_gists, posts_data):
+            if post_data is None:
+                continue
+            own_posts.append((gist, _parse_issued_at(post_data["payload"]["issued_at"])))
+
+        live_id = self.gist_wrapper.gist_id
+        current_id = live_id
+        if current_id is None and own_posts:
+            current_id = max(own_posts, key=lambda post: post[1])[0]["id"]
+
+        now = datetime.now(timezone.utc)
+        stale = [
+            gist for gist, issued_at in own_posts
+            if gist["id"] != current_id
+            or (live_id is None and max_age is not None and now - issued_at > max_age)
+        ]
+
+        deleted = []
+        for gist in stale[:max_deletes]:
+            try:
+                self.gist_wrapper.delete_gist(gist["id"])
+            except Exception as e:
+                print(f"Failed to delete stale post {gist['id']}: {e}")
+                continue
+            deleted.append(gist)
+            self.member_table.pop(gist["id"], None)
+            self._member_revisions.pop(gist["id"], None)
+
+        bytes_saved = sum(
+            file_obj.get("size", 0)
+            for gist in deleted
+            for file_obj in gist.get("files", {}).values()
+        )
 
-        gists = self.gist_wrapper.get_gists_by_key_discription(self.group_name)
-        #print(f"Found {len(gists)} gists with '{self.group_name}' in description.")
-        
-        for gist in gists:
-            contents = self.gist_wrapper.get_gist_contents(gist)
-            id = gist["id"]
-            #print(f"\n\n ---------{id}----->")
+        return {
+            "own_posts": len(own_posts),
+            "kept": current_id if current_id not in {gist["id"] for gist in deleted} else None,
+            "deleted": len(deleted),
+            "remaining_stale": len(stale) - len(deleted),
+            # Per future full scan: one content download and a decrypt/verify per
+            # deleted post, and a listing page per 30 of them
+            "bytes_saved_per_poll": bytes_saved,
+            "requests_saved_per_poll": len(deleted) + len(deleted) // 30,
+        }
+
+    def get_members(
+        self,
+        incremental: bool = True,
+        known_keys: Optional[dict] = None,
+        owners: Optional[list[str]] = None,
+    ) -> list[dict]:
+        """
+        Return every verified post of the group from a known sender.
+
+        Senders are looked up in known_keys (sender key id -> PEM public key),
+        by default `self.known_keys` (ourselves and the members of the last
+        get_known_members call). Compact posts do not carry their sender's key,
+        so they can only be verified this way; posts from anyone else are
+        dropped before they are decrypted or verified.
+
+        With owners only posts of those accounts are listed, and the store may
+        fetch them owner by owner instead of scanning the whole feed (see
+        `gist_wrapper.last_fetch` for what it did).
+
+        Before any content is downloaded, posts are filtered on their parsed
+        description: the group must match exactly, the owner must be the
+        account holding the post and, with owners, one of them.
+
+        In incremental mode only gists changed since the last poll are fetched,
+        decrypted and verified, and merged into `member_table`. Every
+        `full_scan_every` polls (and on the first one) the whole feed is walked
+        again, which also drops posts whose gist was deleted.
+        """
+        for _ in self.iter_members(incremental, known_keys, owners):
+            pass
+        return list(self.member_table.values())
+
+    def iter_members(
+        self,
+        incremental: bool = True,
+        known_keys: Optional[dict] = None,
+        owners: Optional[list[str]] = None,
+    ) -> Iterator[list[dict]]:
+        """
+        Streaming get_members: each page of the listing is downloaded, decrypted,
+        verified and merged into `member_table` as soon as it arrives, and the
+        posts it brought in are yielded. Deleted posts are dropped once the
+        listing is walked to the end.
+        """
+        if known_keys is None:
+            known_keys = self.known_keys
+
+        full = (
+            not incremental
+            or self._polls_since_full_scan is None
+            or self._polls_since_full_scan >= self.full_scan_every
+        )
 
-            info = contents['user_data.txt']
-            #print(info)
+        if owners is None:
+            batches = self.gist_wrapper.iter_changed_gists_by_key_discription(self.group_name, full=full)
+        else:
+            batches = self.gist_wrapper.iter_changed_gists_for_owners(self.group_name, owners, full=full)
+        owner_set = None if owners is None else set(owners)
+
+        listed = 0
+        live_ids = set()
+        self.last_prefilter = None
+        for gists in batches:
+            listed += len(gists)
+            index = index_posts(gists, self.group_name)
+            gists = [
+                gist for owner, owner_gists in index.items()
+                if owner_set is None or owner in owner_set
+                for gist in owner_gists
+            ]
+            live_ids.update(gist["id"] for gist in gists)
+
+            # The listing is inclusive of the cursor, skip revisions already merged
+            gists = [
+                gist for gist in gists
+                if _revision(gist) is None or self._member_revisions.get(gist["id"]) != _revision(gist)
+            ]
+            if not gists:
+                continue
+
+            gists_contents = self.gist_wrapper.get_gists_contents(gists)
+
+            infos = [contents.get('user_data.txt') for contents in gists_contents]
+            posts_data = postMaker.read_posts(infos, self.keyring, cache=self.post_cache, known_keys=known_keys)
+
+            merged = []
+            for gist, info, post_data in zip(gists, infos, posts_data):
+                id = gist["id"]
+                #print(f"\n\n ---------{id}----->")
+
+                if info is None:
+                    continue
+
+                if post_data is None:
+                    self.member_table.pop(id, None)
+                    self._member_revisions.pop(id, None)
+                    continue
+
+                #print(post_data)
+                self.member_table[id] = post_data
+                self._member_revisions[id] = _revision(gist)
+                merged.append(post_data)
+
+            if merged:
+                yield merged
+
+        self.last_prefilter = {"listed": listed, "kept": len(live_ids)}
+
+        if owners is not None:
+            # An owner by owner listing is complete, it also tells us what was deleted
+            full = self.gist_wrapper.last_fetch["complete"]
+
+        if full:
+            self._polls_since_full_scan = 0
+            for id in list(self.member_table):
+                if id not in live_ids:
+                    del self.member_table[id]
+                    self._member_revisions.pop(id, None)
+        else:
+            self._polls_since_full_scan += 1
+
+    def _member_index(self, known_members: list[dict]) -> dict:
+        """
+        (name, key fingerprint) -> known member, rebuilt only when the member list changes.
+        """
+        index_key = tuple((m.get('name'), m.get('rsa_public_key')) for m in known_members)
+        if index_key != self._member_index_key:
+            self._known_members_index = {
+                (known_member['name'], _key_fingerprint(known_member.get('rsa_public_key'))): known_member
+                for known_member in known_members
+            }
+            self._known_member_names = {known_member['name'] for known_member in known_members}
+
+            self.known_keys = dict(self._own_keys)
+            for known_member in known_members:
+                key_obj = _to_public_key_obj(known_member.get('rsa_public_key'))
+                if key_obj is None:
+                    continue
+                pem = key_obj.public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo)
+                self.known_keys[postMaker.sender_key_id(pem)] = pem
+
+            # Posts of new members were dropped unread so far, walk the whole feed again
+            if self._member_index_key is not None:
+                self._polls_since_full_scan = None
+            self._member_index_key = index_key
+        return self._known_members_index
 
-            post_data = postMaker.read_post(info, self.group_key)
-            if post_data is None: continue
+    def get_known_members(self, known_members: list[dict]) -> list[dict]:
+        """
+        Newest verified post of every known member.
+        """
+        for _ in self.iter_known_members(known_members):
+            pass
 
-            #print(post_data)
-            members.append(post_data)
-            
-        return members
+        index = self._member_index(known_members)
+        known_members_gists = self._known_posts(self.member_table.values(), index)
+        print(f"\nfaound: {len(self.member_table)} gists with '{self.group_name}' is the discription.")
+        print(f'{len(known_members_gists)}/{len(self.member_table)} whare known')
 
-    def get_known_members(self, known_members: list[dict]) -> list[dict]:
-        members_gists = self.get_members()
-        print(f"\nfaound: {len(members_gists)} gists with '{self.group_name}' is the discription.")
+        #only the newest for each name
+        return self.find_newest_post(known_members_gists)
+
+    def iter_known_members(self, known_members: list[dict]) -> Iterator[dict]:
+        """
+        Stream known members' posts while the feed is being read: a post is yielded
+        as soon as it is the newest seen for its member, so the first peers can be
+        applied after the first page instead of the whole scan.
+
+        Ends with a reconciliation pass over everything known: the newest post of
+        every member is yielded again unless it is the one last yielded for them,
+        so applying the posts in order leaves every member at their newest post.
+        """
+        index = self._member_index(known_members)
+        owners = [*self._known_member_names, self.username]
+
+        newest = {}  # name -> issued_at of the newest post seen
+        for post in self.find_newest_post(self._known_posts(self.member_table.values(), index)):
+            newest[post["name"]] = _parse_issued_at(post["payload"]["issued_at"])
+
+        yielded = {}  # name -> payload last yielded
+        for posts_data in self.iter_members(known_keys=self.known_keys, owners=owners):
+            for post in self._known_posts(posts_data, index):
+                name = post["name"]
+                issued_at = _parse_issued_at(post["payload"]["issued_at"])
+                if name in newest and issued_at <= newest[name]:
+                    continue
+                newest[name] = issued_at
+                yielded[name] = post["payload"]
+                yield post
+
+        for post in self.find_newest_post(self._known_posts(self.member_table.values(), index)):
+            if yielded.get(post["name"]) != post["payload"]:
+                yield post
+
+    def _known_posts(self, posts_data, index: dict) -> list[dict]:
+        """
+        The verified posts that are from known members (name and key both match).
+        """
         known_members_gists = []
 
-        for member in members_gists:
+        for member in posts_data:
             pub_key = member['sender_pub_key']
             payload = member['payload']
             member_name = payload['username']
 
+            if member_name not in self._known_member_names:
+                continue
 
-            #print(member_name)
-
-
-            for known_member in known_members:
-                #print('\n\n\n\n------------------')
-                if known_member['name'] == member_name:
-
-                    #print(f'faound mach in name {member_name}')
-
-                    # Safe printing (avoid mismatched quoting) and normalize keys
-                    #print("data base rsa key :\n" + str(known_member.get('rsa_public_key')))
-                    try:
-                        remote_key_str = pub_key.decode() if isinstance(pub_key, (bytes, bytearray)) else str(pub_key)
-                    except Exception:
-                        remote_key_str = str(pub_key)
-                    #print("qury rsa kay      :\n" + remote_key_str)
-
-                    # Parse both sides into public-key objects (if possible) and compare key material
-                    
-                    local_obj = _to_public_key_obj(known_member.get('rsa_public_key'))
-                    remote_obj = _to_public_key_obj(pub_key)
-
-                    matched = False
-                    # If both parsed to RSA public keys, compare numeric values
-                    if local_obj is not None and remote_obj is not None:
-                        try:
-                            if isinstance(local_obj, crypto_rsa.RSAPublicKey) and isinstance(remote_obj, crypto_rsa.RSAPublicKey):
-                                ln = local_obj.public_numbers()
-                                rn = remote_obj.public_numbers()
-                                if ln.n == rn.n and ln.e == rn.e:
-                                    matched = True
-                        except Exception:
-                            matched = False
-
-                    if not matched:
-                        # Fallback: compare DER sha256 fingerprints (tolerant to formatting differences)
-                        def _fingerprint(obj_or_raw):
-                            if obj_or_raw is None:
-                                return None
-                            if hasattr(obj_or_raw, 'public_bytes'):
-                                try:
-                                    der = obj_or_raw.public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
-                                    return hashlib.sha256(der).hexdigest()
-                                except Exception:
-                                    pass
-                            raw = obj_or_raw
-                            if not isinstance(raw, (bytes, bytearray)):
-                                raw = str(raw).encode()
-                            cleaned = raw.decode(errors='ignore').strip().replace(' ', '').replace('\r', '').replace('\n', '')
-                            try:
-                                decoded = base64.b64decode(cleaned)
-                                return hashlib.sha256(decoded).hexdigest()
-                            except Exception:
-                                return hashlib.sha256(cleaned.encode()).hexdigest()
-
-                        local_fp = _fingerprint(local_obj if local_obj is not None else known_member.get('rsa_public_key'))
-                        remote_fp = _fingerprint(remote_obj if remote_obj is not None else pub_key)
-                        if local_fp is not None and remote_fp is not None and local_fp == remote_fp:
-                            matched = True
-
-                    if matched:
-                        known_members_gists.append({
-                            "name": member_name,
-                            "pub_key": pub_key,
-                            "payload": payload
-                        })
-                        break
-                    else:
-                        print(f"Public key mismatch for member '{member_name}'. Skipping.")
-                        pass
-                
-        print(f'{len(known_members_gists)}/{len(members_gists)} whare known')
-
-        #only the newest for each name
-        new_posts = self.find_newest_post(known_members_gists)
+            # Keys are compared by SPKI fingerprint (tolerant to formatting differences)
+            if (member_name, _key_fingerprint(pub_key)) in index:
+                known_members_gists.append({
+                    "name": member_name,
+                    "pub_key": pub_key,
+                    "payload": payload
+                })
+            else:
+                print(f"Public key mismatch for member '{member_name}'. Skipping.")
 
-        return new_posts
-         
+        return known_members_gists
 
     def find_newest_post(self, known_members_gists: list[dict]) -> list[dict]:
         newest_by_name = {}
@@ -178,6 +500,38 @@ class Group:
 
 
 
+@lru_cache(maxsize=4096)
+def _key_fingerprint(maybe_pem) -> Optional[str]:
+    """
+    sha256 of a public key's SubjectPublicKeyInfo DER, whatever form it came in.
+    Cached, so every distinct key is parsed once.
+    """
+    if maybe_pem is None:
+        return None
+    key_obj = _to_public_key_obj(maybe_pem)
+    return _fingerprint(key_obj if key_obj is not None else maybe_pem)
+
+
+def _fingerprint(obj_or_raw):
+    if obj_or_raw is None:
+        return None
+    if hasattr(obj_or_raw, 'public_bytes'):
+        try:
+            der = obj_or_raw.public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+            return hashlib.sha256(der).hexdigest()
+        except Exception:
+            pass
+    raw = obj_or_raw
+    if not isinstance(raw, (bytes, bytearray)):
+        raw = str(raw).encode()
+    cleaned = raw.decode(errors='ignore').strip().replace(' ', '').replace('\r', '').replace('\n', '')
+    try:
+        decoded = base64.b64decode(cleaned)
+        return hashlib.sha256(decoded).hexdigest()
+    except Exception:
+        return hashlib.sha256(cleaned.encode()).hexdigest()
+
+
 def _to_public_key_obj(maybe_pem):
                         if maybe_pem is None:
                             return None
@@ -214,7 +568,30 @@ def _to_public_key_obj(maybe_pem):
                         return None
 
 
-from datetime import datetime, timezone
+def _revision(gist: dict) -> Optional[str]:
+    """
+    Something unique per revision of a post. updated_at only has second
+    resolution, so two updates within a second would look the same: a gist's
+    raw_url embeds the revision SHA, and where there is none (GraphQL, the
+    directory store) the content is in the listing and is hashed instead.
+    None if neither is known, which never matches, so the post is read again.
+    """
+    file_obj = gist.get("files", {}).get("user_data.txt") or {}
+    raw_url = file_obj.get("raw_url") or ""
+    if raw_url.startswith(("http://", "https://")):
+        return raw_url
+
+    content = file_obj.get("content")
+    if content is not None:
+        return "sha256:" + hashlib.sha256(content.encode()).hexdigest()
+    return None
+
+
+def _logical_payload(payload: dict) -> dict:
+    """
+    What a post says, without when it was said.
+    """
+    return {key: value for key, value in payload.items() if key != "issued_at"}
 
 def _parse_issued_at(value):
     if isinstance(value, int):
@@ -0,0 +1,635 @@
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, List, Iterator
+from urllib.parse import urlsplit, parse_qs
+
+from distribution_layer.rendezvous_backend import index_posts, group_posts
+
+
+FILENAME = "user_data.txt"
+
+# The aliased user(login:) { gists(first:, after:) } selections gist_wrapper sends
+_GRAPHQL_USER_GISTS = re.compile(
+    r"(\w+):\s*user\(login:\s*\$(\w+)\)\s*\{\s*gists\(first:\s*(\d+)(?:,\s*after:\s*\$(\w+))?"
+)
+
+
+def _iso(ts: float, precise: bool = False) -> str:
+    fmt = "%Y-%m-%dT%H:%M:%S.%fZ" if precise else "%Y-%m-%dT%H:%M:%SZ"
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime(fmt)
+
+
+# -------------------------
+# Directory backed store
+# -------------------------
+
+class DirectoryUserStore:
+    """
+    Rendezvous store on a (shared) directory, one JSON file per post.
+
+    Same API as gist_wrapper.GitHubGistUserStore. A post's updated_at is the
+    file's mtime, so incremental listings only open files changed since the
+    cursor.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        owner: str,
+        group_name: str,
+        gist_id: Optional[str] = None,
+    ):
+        """
+        :param directory: Directory holding the posts, created if missing
+        :param owner: Name recorded as the owner of our posts
+        :param group_name: Group name stored in the description
+        :param gist_id: Existing post ID (optional)
+        """
+        self.directory = directory
+        self.owner = owner
+        self.group = group_name
+        self.gist_id = gist_id
+
+        self.FILENAME = FILENAME
+
+        # updated_at high-water mark of the last listing, for incremental polls
+        self.since_cursor: Optional[str] = None
+        # Strategy and cost of the last get_changed_gists_for_owners call
+        self.last_fetch: Optional[dict] = None
+
+        os.makedirs(directory, exist_ok=True)
+
+    # -------------------------
+    # Internal helpers
+    # -------------------------
+
+    def _description(self) -> str:
+        return f"[group:{self.group}]-[owner:{self.owner}]"
+
+    def _path(self, gist_id: str) -> str:
+        return os.path.join(self.directory, f"{gist_id}.json")
+
+    def _write(self, gist_id: str, content: str) -> None:
+        record = {
+            "id": gist_id,
+            "description": self._description(),
+            "owner": self.owner,
+            "content": content,
+        }
+        # Write then rename, so readers never see a half written post
+        tmp_path = self._path(gist_id) + f".{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(record, f)
+        os.replace(tmp_path, self._path(gist_id))
+
+    def _load(self, path: str, updated_at: str) -> Optional[dict]:
+        try:
+            with open(path, "r") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        return {
+            "id": record["id"],
+            "description": record.get("description", ""),
+            "updated_at": updated_at,
+            "owner": {"login": record.get("owner")},
+            "files": {
+                self.FILENAME: {
+                    "filename": self.FILENAME,
+                    "content": record.get("content"),
+                    "raw_url": f"file://{os.path.abspath(path)}",
+                    "size": len(record.get("content") or ""),
+                }
+            },
+        }
+
+    def _list_gists(self, since: Optional[str] = None) -> List[dict]:
+        gists = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    updated_at = _iso(entry.stat().st_mtime, precise=True)
+                except OSError:
+                    continue  # deleted while listing
+                if since and updated_at < since:
+                    continue
+
+                gist = self._load(entry.path, updated_at)
+                if gist is not None:
+                    gists.append(gist)
+
+        gists.sort(key=lambda gist: gist["updated_at"], reverse=True)
+        return gists
+
+    # -------------------------
+    # Public API
+    # -------------------------
+
+    def upsert_user(self, content: str) -> str:
+        """
+        Create or update our post.
+
+        :return: gist_id
+        """
+        if self.gist_id is None or not os.path.exists(self._path(self.gist_id)):
+            self.gist_id = uuid.uuid4().hex
+
+        self._write(self.gist_id, content)
+        return self.gist_id
+
+    def delete_gist(self, gist_id: str) -> None:
+        try:
+            os.remove(self._path(gist_id))
+        except FileNotFoundError:
+            pass
+
+        if gist_id == self.gist_id:
+            self.gist_id = None
+
+    def find_own_gist_id(self) -> Optional[str]:
+        for gist in self._list_gists():
+            if gist["description"] == self._description() and gist["owner"]["login"] == self.owner:
+                return gist["id"]
+        return None
+
+    def get_user_content(self) -> str:
+        if not self.gist_id:
+            raise RuntimeError("No gist_id set on this instance")
+
+        with open(self._path(self.gist_id), "r") as f:
+            return json.load(f)["content"]
+
+    def get_group_users(self) -> List[dict]:
+        return [
+            gist for gist in self._list_gists()
+            if gist["description"] == self._description()
+        ]
+
+    def get_group_user_contents(self) -> List[str]:
+        return [gist["files"][self.FILENAME]["content"] for gist in self.get_group_users()]
+
+    def get_gists_by_key_discription(self, key: str, since: Optional[str] = None) -> List[dict]:
+        return group_posts(self._list_gists(since), key)
+
+    def get_changed_gists_by_key_discription(self, key: str, full: bool = False) -> List[dict]:
+        since = None if full else self.since_cursor
+        all_gists = self._list_gists(since)
+
+        if all_gists:
+            newest = all_gists[0]["updated_at"]
+            if self.since_cursor is None or newest > self.since_cursor:
+                self.since_cursor = newest
+
+        return [gist for gist in all_gists if key in gist["description"]]
+
+    def iter_changed_gists_by_key_discription(self, key: str, full: bool = False) -> Iterator[List[dict]]:
+        # A directory is listed in one go, so there is a single batch
+        yield self.get_changed_gists_by_key_discription(key, full=full)
+
+    def get_changed_gists_for_owners(self, key: str, owners: List[str], full: bool = False) -> List[dict]:
+        # Listing the directory is cheap, there is nothing to target
+        complete = full or self.since_cursor is None
+        start = time.time()
+        listed = self.get_changed_gists_by_key_discription(key, full=full)
+
+        owner_set = set(owners)
+        index = index_posts(listed, key)
+        gists = [gist for owner in owner_set for gist in index.get(owner, [])]
+
+        self.last_fetch = {
+            "strategy": "scan",
+            "complete": complete,
+            "owners": len(owner_set),
+            "requests": 0,
+            "gists_listed": len(listed),
+            "gists_matched": len(gists),
+            "seconds": time.time() - start,
+        }
+        return gists
+
+    def iter_changed_gists_for_owners(self, key: str, owners: List[str], full: bool = False) -> Iterator[List[dict]]:
+        yield self.get_changed_gists_for_owners(key, owners, full=full)
+
+    def get_gist_contents(self, gist: dict) -> dict:
+        return self.get_gists_contents([gist])[0]
+
+    def get_gists_contents(self, gists: List[dict]) -> List[dict]:
+        # Listings already carry the content
+        return [
+            {filename: file_obj.get("content") for filename, file_obj in gist.get("files", {}).items()}
+            for gist in gists
+        ]
+
+    def get_gist_id(self, gist: dict) -> str:
+        return gist.get("id")
+
+
+# -------------------------
+# In-process gist API stand-in
+# -------------------------
+
+class LocalGistServer:
+    """
+    Small in-process HTTP server mimicking the parts of the GitHub gist API
+    closedNet uses, for offline load tests and self hosted rendezvous.
+
+    Use it through GitHubGistUserStore(..., base_url=server.url). The token is
+    taken as the login of the caller ("Authorization: token alice").
+
+    Supported: GET/POST /gists and GET /users/{owner}/gists (per_page, page,
+    since, Link header), GET/PATCH/DELETE /gists/{id}, immutable raw urls and
+    POST /graphql for the batched user gist queries of GitHubGistUserStore.
+    Responses carry ETags and answer If-None-Match with 304, and every caller
+    gets a rate limit window with the usual X-RateLimit-* headers (304s and raw
+    downloads are free).
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        rate_limit: int = 5000,
+        rate_window: float = 3600.0,
+        latency: float = 0.0,
+    ):
+        """
+        :param port: 0 picks a free port
+        :param rate_limit: Requests per caller per window
+        :param rate_window: Window length in seconds
+        :param latency: Seconds added to every response, to simulate RTT
+        """
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.latency = latency
+
+        self.gists = {}  # id -> {"id", "description", "owner", "content", "revision", "created_at", "updated_at"}
+        self.raw = {}  # (id, revision) -> content, revisions never change
+        self._windows = {}  # (login, resource) -> [window reset epoch, used]
+        self._lock = threading.Lock()
+
+        self.request_count = 0
+        self.not_modified_count = 0
+
+        self._httpd = _GistHTTPServer((host, port), _GistRequestHandler)
+        self._httpd.gist_server = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # -------------------------
+    # Data
+    # -------------------------
+
+    def seed(self, description: str, content: str, owner: str = "seed") -> str:
+        """
+        Add a gist directly, e.g. thousands of fake members for a load test.
+        """
+        with self._lock:
+            return self._put(None, description, content, owner)
+
+    def _put(self, gist_id: Optional[str], description: str, content: str, owner: str) -> str:
+        now = time.time()
+        revision = hashlib.sha1(content.encode()).hexdigest()
+        if gist_id is None:
+            gist_id = uuid.uuid4().hex
+            self.gists[gist_id] = {"id": gist_id, "owner": owner, "created_at": _iso(now)}
+
+        gist = self.gists[gist_id]
+        gist.update({
+            "description": description,
+            "content": content,
+            "revision": revision,
+            "updated_at": _iso(now),
+        })
+        self.raw[(gist_id, revision)] = content
+        return gist_id
+
+    def _delete(self, gist_id: str) -> None:
+        del self.gists[gist_id]
+        for key in [key for key in self.raw if key[0] == gist_id]:
+            del self.raw[key]
+
+    def _gist_json(self, gist: dict, with_content: bool) -> dict:
+        file_obj = {
+            "filename": FILENAME,
+            "raw_url": f"{self.url}/raw/{gist['id']}/{gist['revision']}/{FILENAME}",
+            "size": len(gist["content"].encode()),
+        }
+        if with_content:
+            file_obj["content"] = gist["content"]
+            file_obj["truncated"] = False
+
+        return {
+            "id": gist["id"],
+            "description": gist["description"],
+            "public": True,
+            "owner": {"login": gist["owner"]},
+            "created_at": gist["created_at"],
+            "updated_at": gist["updated_at"],
+            "files": {FILENAME: file_obj},
+        }
+
+    def _listing(self, gists: List[dict], query: dict, path: str):
+        """
+        One page of a listing, newest first, plus its Link header.
+        """
+        per_page = min(int(query.get("per_page", 30)), 100)
+        page = max(int(query.get("page", 1)), 1)
+        since = query.get("since")
+        if since:
+            gists = [gist for gist in gists if gist["updated_at"] >= since]
+        gists = sorted(gists, key=lambda gist: (gist["updated_at"], gist["created_at"]), reverse=True)
+
+        last_page = max((len(gists) + per_page - 1) // per_page, 1)
+        page_gists = gists[(page - 1) * per_page:page * per_page]
+
+        def link(n):
+            params = f"per_page={per_page}&page={n}" + (f"&since={since}" if since else "")
+            return f"<{self.url}{path}?{params}>"
+
+        links = []
+        if page < last_page:
+            links.append(f'{link(page + 1)}; rel="next"')
+            links.append(f'{link(last_page)}; rel="last"')
+        if page > 1:
+            links.append(f'{link(1)}; rel="first"')
+            links.append(f'{link(page - 1)}; rel="prev"')
+
+        return [self._gist_json(gist, with_content=False) for gist in page_gists], ", ".join(links)
+
+    def _graphql(self, request: dict) -> dict:
+        """
+        Answer a query made of aliased user(login:) { gists(first:, after:) } selections,
+        with every gist field gist_wrapper asks for. Cursors are offsets.
+        """
+        variables = request.get("variables") or {}
+        data = {}
+        for alias, login_var, first, after_var in _GRAPHQL_USER_GISTS.findall(request.get("query", "")):
+            login = variables.get(login_var)
+            cursor = variables.get(after_var) if after_var else None
+            offset = int(base64.b64decode(cursor)) if cursor else 0
+            first = min(int(first), 100)
+
+            owner_gists = sorted(
+                (gist for gist in self.gists.values() if gist["owner"] == login),
+                key=lambda gist: (gist["updated_at"], gist["created_at"]),
+                reverse=True,
+            )
+            page = owner_gists[offset:offset + first]
+            end = offset + len(page)
+
+            data[alias] = {"gists": {
+                "pageInfo": {
+                    "hasNextPage": end < len(owner_gists),
+                    "endCursor": base64.b64encode(str(end).encode()).decode() if page else None,
+                },
+                "nodes": [
+                    {
+                        "name": gist["id"],
+                        "description": gist["description"],
+                        "updatedAt": gist["updated_at"],
+                        "owner": {"login": gist["owner"]},
+                        "files": [{"name": FILENAME, "text": gist["content"], "size": len(gist["content"].encode())}],
+                    }
+                    for gist in page
+                ],
+            }}
+        return {"data": data}
+
+    def _rate_headers(self, login: str, count: bool, resource: str = "core") -> tuple:
+        """
+        Charge a request to the caller's window of resource (core or graphql,
+        each its own budget as on GitHub), returns (allowed, headers).
+        """
+        now = time.time()
+        window = self._windows.get((login, resource))
+        if window is None or now >= window[0]:
+            window = self._windows[(login, resource)] = [now + self.rate_window, 0]
+
+        allowed = window[1] < self.rate_limit
+        if allowed and count:
+            window[1] += 1
+
+        headers = {
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Remaining": str(self.rate_limit - window[1]),
+            "X-RateLimit-Reset": str(int(window[0])),
+            "X-RateLimit-Used": str(window[1]),
+            "X-RateLimit-Resource": resource,
+        }
+        return allowed, headers
+
+
+class _GistHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connects of a parallel client (max_workers=16),
+    # which then stall for a one second SYN retransmit
+    request_queue_size = 128
+
+
+class _GistRequestHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def store(self) -> LocalGistServer:
+        return self.server.gist_server
+
+    def _login(self) -> str:
+        auth = self.headers.get("Authorization", "")
+        return auth.split(" ", 1)[1] if " " in auth else "anonymous"
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send(self, status: int, body=None, headers: Optional[dict] = None, raw: Optional[str] = None) -> None:
+        data = b""
+        if raw is not None:
+            data = raw.encode()
+        elif body is not None:
+            data = json.dumps(body).encode()
+
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if data:
+            self.send_header("Content-Type", "text/plain" if raw is not None else "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if data:
+            self.wfile.write(data)
+
+    def _handle(self, method: str) -> None:
+        store = self.store
+        if store.latency:
+            time.sleep(store.latency)
+
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        with store._lock:
+            store.request_count += 1
+
+            # Raw content lives outside the API, no rate limit
+            if method == "GET" and len(parts) == 4 and parts[0] == "raw":
+                content = store.raw.get((parts[1], parts[2]))
+                if content is None:
+                    return self._send(404, {"message": "Not Found"})
+                return self._send(200, raw=content)
+
+            status, body, headers = self._api(method, parts, query)
+            if status == 200 and method == "GET":
+                etag = '"' + hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest() + '"'
+                headers["ETag"] = etag
+                if self.headers.get("If-None-Match") == etag:
+                    store.not_modified_count += 1
+                    status, body = 304, None
+
+            resource = "graphql" if parts == ["graphql"] else "core"
+            allowed, rate_headers = store._rate_headers(self._login(), count=status != 304, resource=resource)
+            headers.update(rate_headers)
+            if not allowed:
+                status, body = 403, {"message": "API rate limit exceeded"}
+                headers.pop("ETag", None)
+
+            # Only apply writes the rate limit allowed
+            if allowed and status < 300 and method != "GET" and parts[0] == "gists":
+                body = self._write(method, parts)
+                if method == "POST":
+                    status = 201
+
+        self._send(status, body, headers)
+
+    def _api(self, method: str, parts: list, query: dict) -> tuple:
+        """
+        Route a read, returns (status, body, headers). Writes are done in _write.
+        """
+        store = self.store
+
+        if parts == ["graphql"] and method == "POST":
+            return 200, store._graphql(self._body()), {}
+
+        if parts == ["gists"]:
+            if method == "GET":
+                page, link = store._listing(list(store.gists.values()), query, "/gists")
+                return 200, page, {"Link": link} if link else {}
+            if method == "POST":
+                return 200, None, {}
+
+        if len(parts) == 3 and parts[0] == "users" and parts[2] == "gists" and method == "GET":
+            owner_gists = [gist for gist in store.gists.values() if gist["owner"] == parts[1]]
+            page, link = store._listing(owner_gists, query, f"/users/{parts[1]}/gists")
+            return 200, page, {"Link": link} if link else {}
+
+        if len(parts) == 2 and parts[0] == "gists":
+            gist = store.gists.get(parts[1])
+            if gist is None:
+                return 404, {"message": "Not Found"}, {}
+            if method == "GET":
+                return 200, store._gist_json(gist, with_content=True), {}
+            if method in ("PATCH", "DELETE"):
+                if gist["owner"] != self._login():
+                    return 404, {"message": "Not Found"}, {}
+                return 200, None, {}
+
+        return 404, {"message": "Not Found"}, {}
+
+    def _write(self, method: str, parts: list):
+        store = self.store
+
+        if method == "DELETE":
+            store._delete(parts[1])
+            return None
+
+        body = self._body()
+        gist_id = parts[1] if len(parts) == 2 else None
+        description = body.get("description")
+        if description is None and gist_id is not None:
+            description = store.gists[gist_id]["description"]
+        content = body["files"][FILENAME]["content"]
+
+        gist_id = store._put(gist_id, description or "", content, self._login())
+        return store._gist_json(store.gists[gist_id], with_content=True)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+
+
+
+##tests
+
+
+
+def test1(members: int = 1000):
+    """
+    Discovery load test against the local stand-in.
+    """
+    from distribution_layer import gist_wrapper
+
+    with LocalGistServer() as server:
+        for i in range(members):
+            server.seed(f"[group:load-test]-[owner:member{i}]", f"post {i}", owner=f"member{i}")
+
+        store = gist_wrapper.GitHubGistUserStore(
+            token="me",
+            owner="me",
+            group_name="load-test",
+            base_url=server.url,
+        )
+
+        start = time.time()
+        gists = store.get_changed_gists_by_key_discription("load-test", full=True)
+        contents = store.get_gists_contents(gists)
+        print(f"full scan: {len(contents)} posts in {time.time() - start:.2f}s, {server.request_count} requests")
+
+        start = time.time()
+        gists = store.get_changed_gists_by_key_discription("load-test")
+        print(f"incremental poll: {len(gists)} changed in {time.time() - start:.3f}s")
+        print(f"budget: {store.scheduler.budget()}")
+
+
+if __name__ == "__main__":
+    test1()
@@ -2,6 +2,110 @@ from datetime import datetime, timezone
 from distribution_layer import blake2b_wrapper as blake
 import json
 from distribution_layer import rsa_enryption as rsa
+from distribution_layer import ed25519_signing as ed25519
+from collections import OrderedDict
+from typing import Optional
+import hashlib
+import os
+import struct
+import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+
+# Signature suites. v1 posts (no "v" field) are always RSA, v2 posts name their suite
+SUITE_RSA = "rsa-pss-sha256"
+SUITE_ED25519 = "ed25519"
+
+_SUITES = {
+    SUITE_RSA: rsa,
+    SUITE_ED25519: ed25519,
+}
+
+
+# Post encodings. Readers accept both, the compact one is smaller and needs no hex decoding
+FORMAT_JSON = "json"        # hex fields in JSON (v1/v2)
+FORMAT_COMPACT = "compact"  # length prefixed binary container, base64 transport (v3)
+
+# Compact container: "cn3." + base64(MAGIC + fields), each field is tag (1 byte) +
+# length (2 bytes, big endian) + value. Readers skip tags they do not know.
+COMPACT_PREFIX = "cn3."
+_COMPACT_MAGIC = b"CN\x03"
+
+_TAG_SUITE = 1       # 1 byte, see _SUITE_IDS
+_TAG_PUB_KEY = 2     # sender public key, SubjectPublicKeyInfo DER
+_TAG_SIGNATURE = 3
+_TAG_PRIV_INFO = 4   # encrypted payload
+_TAG_SENDER_KID = 5  # sender_key_id of the sender key, in clear
+_TAG_GROUP_KID = 6   # blake2b_wrapper.group_key_id of the group key, in clear
+
+_SUITE_IDS = {SUITE_RSA: 1, SUITE_ED25519: 2}
+_SUITES_BY_ID = {suite_id: suite for suite, suite_id in _SUITE_IDS.items()}
+
+
+def key_suite(private_or_public_key: bytes) -> str:
+    """
+    Signature suite of a PEM key.
+    """
+    return SUITE_ED25519 if ed25519.is_ed25519_key(private_or_public_key) else SUITE_RSA
+
+
+def sender_key_id(pub_key: bytes) -> bytes:
+    """
+    Short id of a PEM public key: the first 8 bytes of the sha256 of its
+    SubjectPublicKeyInfo DER. Compact posts carry it in clear so readers can
+    drop posts from unknown senders with a dict lookup.
+    """
+    return hashlib.sha256(_pem_to_der(pub_key)).digest()[:8]
+
+
+def _pem_to_der(pem: bytes) -> bytes:
+    body = b"".join(line for line in pem.strip().splitlines() if not line.startswith(b"-----"))
+    return base64.b64decode(body)
+
+
+def _der_to_pem(der: bytes) -> bytes:
+    # Same layout as cryptography's PEM output, so keys round trip byte for byte
+    b64 = base64.b64encode(der)
+    lines = [b64[i:i + 64] for i in range(0, len(b64), 64)]
+    return b"-----BEGIN PUBLIC KEY-----\n" + b"\n".join(lines) + b"\n-----END PUBLIC KEY-----\n"
+
+
+def _encode_compact(fields: list) -> str:
+    """
+    :param fields: list of (tag, value bytes)
+    """
+    container = bytearray(_COMPACT_MAGIC)
+    for tag, value in fields:
+        container += struct.pack(">BH", tag, len(value))
+        container += value
+    return COMPACT_PREFIX + base64.b64encode(bytes(container)).decode()
+
+
+def _decode_compact(post: str) -> Optional[dict]:
+    """
+    :return: {tag: value bytes}, None if the container is malformed
+    """
+    try:
+        container = base64.b64decode(post[len(COMPACT_PREFIX):], validate=True)
+    except ValueError:
+        return None
+    if not container.startswith(_COMPACT_MAGIC):
+        return None
+
+    fields = {}
+    offset = len(_COMPACT_MAGIC)
+    while offset < len(container):
+        if offset + 3 > len(container):
+            return None
+        tag, length = struct.unpack_from(">BH", container, offset)
+        offset += 3
+        if offset + length > len(container):
+            return None
+        fields[tag] = container[offset:offset + length]
+        offset += length
+    return fields
+
 
 def create_payload(endpoint: str,
                     username: str,
@@ -20,31 +124,70 @@ def create_payload(endpoint: str,
 
 def create_post(
     key_pair: tuple[bytes, bytes],
-    group_key: bytes,
+    group_key: bytes | blake.GroupKeyring,
     payload: dict,
+    post_format: str = FORMAT_JSON,
+    include_pub_key: bool = False,
     
 ) -> str:
     
     """
     Creates a public post with encrypted and signed contents.
+
+    The signature suite follows the key pair. With FORMAT_JSON, RSA keys make
+    v1 posts that every reader understands and Ed25519 keys make v2 posts.
+    Both also carry the sender key id and the group key id in clear ("kid" and
+    "gkid", older readers ignore them).
+    FORMAT_COMPACT makes v3 posts, roughly half the size, encrypted with the
+    cached per group key (blake2b_wrapper v2). They carry the sender key id and
+    the group key id in clear, and the full public key only with include_pub_key
+    (readers take it from their member list instead). Only older clients cannot
+    read them, so JSON stays the default until a group has moved over.
+
+    With a GroupKeyring the post is encrypted with its current key.
     """
 
     private_key = key_pair[0]  # Extract the private key from the key pair
     pub_key = key_pair[1]  # Extract the public key from the key pair
 
+    suite = key_suite(private_key)
 
+    if isinstance(group_key, blake.GroupKeyring):
+        group_key = group_key.current
 
     byte_data = json.dumps(payload).encode()
 
-    encrypted_payload = blake.encrypt(byte_data, group_key)
-
-    signature = rsa.sign_message(private_key, byte_data)
-
-    post = {
+    # JSON posts are for older readers, who only know per message key derivation
+    encryption_version = 1 if post_format == FORMAT_JSON else 2
+    encrypted_payload = blake.encrypt(byte_data, group_key, version=encryption_version)
+
+    signature = _SUITES[suite].get_signer(private_key).sign(byte_data)
+
+    if post_format == FORMAT_COMPACT:
+        fields = [
+            (_TAG_SUITE, bytes([_SUITE_IDS[suite]])),
+            (_TAG_SENDER_KID, sender_key_id(pub_key)),
+            (_TAG_GROUP_KID, blake.group_key_id(group_key)),
+        ]
+        if include_pub_key:
+            fields.append((_TAG_PUB_KEY, _pem_to_der(pub_key)))
+        fields += [
+            (_TAG_SIGNATURE, signature),
+            (_TAG_PRIV_INFO, encrypted_payload),
+        ]
+        return _encode_compact(fields)
+
+    post = {}
+    if suite != SUITE_RSA:
+        post["v"] = 2
+        post["suite"] = suite
+    post.update({
+        "kid": sender_key_id(pub_key).hex(),
+        "gkid": blake.group_key_id(group_key).hex(),
         "pub_key": pub_key.hex(),
         "signature": signature.hex(),
         "priv_info": encrypted_payload.hex(),
-    }
+    })
 
     #serialize the post to a JSON string
     post = json.dumps(post)
@@ -53,32 +196,352 @@ def create_post(
 
 
 
-def read_post(post: str, group_key: bytes) -> dict:
+class PostCache:
+    """
+    Bounded LRU of read_post results, keyed by a hash of the raw post and
+    the group key. A post that is byte identical to one already read costs
+    one hash and a dict lookup instead of a decrypt and a signature check.
+    Rejected posts are cached too.
+
+    With a path the cache is loaded from and saved to a JSON file, so it
+    survives restarts.
+    """
+
+    _REJECTED = "rejected"
+
+    def __init__(self, max_entries: int = 4096, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()  # hash -> post_data dict, or _REJECTED
+        self._lock = threading.Lock()
+        self._dirty = False
+
+        if path and os.path.exists(path):
+            self.load()
+
+    @staticmethod
+    def key(post: str, group_keys: bytes | tuple) -> str:
+        """
+        :param group_keys: the group key the post is read with, or the keys tried in turn
+        """
+        if isinstance(group_keys, bytes):
+            group_keys = (group_keys,)
+        h = hashlib.blake2b(digest_size=32, person=b"closednet-post")
+        for group_key in group_keys:
+            h.update(hashlib.blake2b(group_key, digest_size=32).digest())
+        h.update(post.encode())
+        return h.hexdigest()
+
+    def get(self, key: str):
+        """
+        :return: (found, post_data or None)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, None if entry is self._REJECTED else entry
+
+    def put(self, key: str, post_data: Optional[dict]) -> None:
+        with self._lock:
+            self._entries[key] = self._REJECTED if post_data is None else post_data
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "r") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        with self._lock:
+            for key, entry in stored.items():
+                if entry != self._REJECTED:
+                    entry = dict(entry, sender_pub_key=bytes.fromhex(entry["sender_pub_key"]))
+                self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def save(self) -> None:
+        """
+        Write the cache to its file, if it has one and anything changed.
+        """
+        if not self.path or not self._dirty:
+            return
+
+        with self._lock:
+            stored = {
+                key: entry if entry is self._REJECTED else dict(entry, sender_pub_key=entry["sender_pub_key"].hex())
+                for key, entry in self._entries.items()
+            }
+            self._dirty = False
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(stored, f)
+        os.replace(tmp_path, self.path)
+
+
+def read_post(
+    post: str,
+    group_key: bytes | blake.GroupKeyring,
+    cache: Optional[PostCache] = None,
+    known_keys: Optional[dict] = None,
+) -> dict:
     """
     Reads a post and returns the decrypted contents.
+
+    :param group_key: the group key, or a GroupKeyring to read posts under any of its
+                      keys (picked by the post's group key id; only posts of older
+                      writers lack one, those are tried with the current key, then
+                      the other accepted keys)
+    :param cache: PostCache to look the post up in first, and to remember the result in
+    :param known_keys: sender key id -> PEM public key (see sender_key_id). When given,
+                       posts from other senders are dropped before any crypto, and the
+                       sender key is taken from here instead of from the post.
+    """
+    opened = _prepare_post(post, group_key, known_keys)
+    if opened is None:
+        return None
+
+    if cache is not None:
+        key = PostCache.key(post, opened[-1])
+        found, post_data = cache.get(key)
+        if found:
+            return post_data
+
+        post_data = _open_post(opened)
+        cache.put(key, post_data)
+        return post_data
+
+    return _open_post(opened)
+
+
+_pools = {}  # (executor, max_workers) -> pool, kept for the life of the process
+_pools_lock = threading.Lock()
+
+
+def _get_pool(executor: str, max_workers: int):
+    with _pools_lock:
+        pool = _pools.get((executor, max_workers))
+        if pool is None:
+            pool_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+            pool = _pools[(executor, max_workers)] = pool_class(max_workers=max_workers)
+        return pool
+
+
+def read_posts(
+    posts: list,
+    group_key: bytes | blake.GroupKeyring,
+    cache: Optional[PostCache] = None,
+    known_keys: Optional[dict] = None,
+    executor: str = "thread",
+    max_workers: Optional[int] = None,
+) -> list:
     """
+    Batch read_post: decrypts and verifies every post not in the cache across
+    a pool sized to the machine's cores. Results are in the same order as
+    posts (None for rejected posts or None entries).
+
+    :param executor: "thread" (the crypto libraries release the GIL) or
+                     "process" (separate interpreters, for hosts where that pays off)
+    :param max_workers: pool size, defaults to the number of cores
+    """
+    results = [None] * len(posts)
+    pending = []  # (index, cache key, prepared post)
+    for i, post in enumerate(posts):
+        if post is None:
+            continue
+        opened = _prepare_post(post, group_key, known_keys)
+        if opened is None:
+            continue
+
+        key = None
+        if cache is not None:
+            key = PostCache.key(post, opened[-1])
+            found, post_data = cache.get(key)
+            if found:
+                results[i] = post_data
+                continue
+        pending.append((i, key, opened))
+
+    workers = max_workers or os.cpu_count() or 1
+    pending_posts = [opened for _, _, opened in pending]
+    if workers == 1 or len(pending) < 2:
+        read = [_open_post(opened) for opened in pending_posts]
+    else:
+        # Bigger chunks for processes, every task is a round trip through a pipe
+        chunksize = max(1, len(pending) // (workers * 4)) if executor == "process" else 1
+        read = list(_get_pool(executor, workers).map(_open_post, pending_posts, chunksize=chunksize))
+
+    for (i, key, _), post_data in zip(pending, read):
+        results[i] = post_data
+        if cache is not None:
+            cache.put(key, post_data)
+
+    return results
+
+
+def _parse_post(post: str) -> Optional[tuple]:
+    """
+    Split a post of any format into
+    (suite, sender PEM public key or None, signature, encrypted payload, sender key id or None, group key id or None).
+
+    Posts come from an untrusted rendezvous point, so anything malformed is
+    None here rather than an exception later.
+    """
+    if not isinstance(post, str):
+        return None
+    if post.startswith(COMPACT_PREFIX):
+        fields = _decode_compact(post)
+        if fields is None:
+            return None
+        try:
+            suite = _SUITES_BY_ID.get(fields[_TAG_SUITE][0])
+            pub_key = _der_to_pem(fields[_TAG_PUB_KEY]) if _TAG_PUB_KEY in fields else None
+            return (
+                suite,
+                pub_key,
+                fields[_TAG_SIGNATURE],
+                fields[_TAG_PRIV_INFO],
+                fields.get(_TAG_SENDER_KID),
+                fields.get(_TAG_GROUP_KID),
+            )
+        except (KeyError, IndexError):
+            return None
+
     try:
         post_data = json.loads(post)
     except json.JSONDecodeError:
         return None
+    if not isinstance(post_data, dict):
+        return None
 
-    sender_pub_key = bytes.fromhex(post_data["pub_key"])
-    signature = bytes.fromhex(post_data["signature"])
-    encrypted_payload = bytes.fromhex(post_data["priv_info"])
+    version = post_data.get("v", 1)
+    if version == 1:
+        suite = SUITE_RSA
+    elif version == 2:
+        suite = post_data.get("suite")
+        if not isinstance(suite, str):
+            return None
+    else:
+        return None
 
     try:
-        decrypted_payload = blake.decrypt(encrypted_payload, group_key)
-    except Exception:
+        return (
+            suite,
+            bytes.fromhex(post_data["pub_key"]),
+            bytes.fromhex(post_data["signature"]),
+            bytes.fromhex(post_data["priv_info"]),
+            _optional_hex(post_data.get("kid")),
+            _optional_hex(post_data.get("gkid")),
+        )
+    except (KeyError, ValueError, TypeError):
+        return None
+
+
+def _optional_hex(value) -> Optional[bytes]:
+    """
+    An optional hex field of a JSON post (posts of older writers lack them).
+    """
+    return None if value is None else bytes.fromhex(value)
+
+
+def _prepare_post(post: str, group_key, known_keys: Optional[dict]) -> Optional[tuple]:
+    """
+    The cheap checks, no crypto: parse the post, pick its group key (drop it
+    if we do not have that key) and, with known_keys, drop it if the sender is
+    unknown and pick the key to verify with.
+
+    A legacy post (older writers, no group key id) read with a GroupKeyring
+    gets every key of the ring as candidates, the current one first.
+
+    :return: (suite, sender PEM public key, signature, encrypted payload, candidate group keys),
+             or None to drop the post
+    """
+    parsed = _parse_post(post)
+    if parsed is None:
         return None
 
-    valid_signature = rsa.verify_signature(sender_pub_key, decrypted_payload, signature)
+    suite, sender_pub_key, signature, encrypted_payload, sender_kid, group_kid = parsed
+    if suite not in _SUITES:
+        return None
+    if isinstance(group_key, blake.GroupKeyring):
+        if group_kid is not None:
+            group_key = group_key.get(group_kid)
+            group_keys = (group_key,) if group_key is not None else ()
+        else:
+            group_keys = (group_key.current,) + tuple(
+                key for key in group_key.keys() if key != group_key.current
+            )
+    elif group_kid is not None and group_kid != blake.group_key_id(group_key):
+        group_keys = ()
+    else:
+        group_keys = (group_key,)
+    if not group_keys:
+        return None
+
+    if known_keys is not None:
+        if sender_kid is None:
+            try:
+                sender_kid = sender_key_id(sender_pub_key)
+            except Exception:
+                return None
+        sender_pub_key = known_keys.get(sender_kid)
+
+    if sender_pub_key is None:
+        return None
+
+    return suite, sender_pub_key, signature, encrypted_payload, group_keys
+
+
+def _open_post(prepared: tuple) -> dict:
+    """
+    Decrypt and verify a prepared post, with the first candidate group key
+    that decrypts it.
+    """
+    suite, sender_pub_key, signature, encrypted_payload, group_keys = prepared
+
+    for group_key in group_keys:
+        try:
+            decrypted_payload = blake.decrypt(encrypted_payload, group_key)
+            break
+        except Exception:
+            continue
+    else:
+        return None
+
+    try:
+        verifier = _SUITES[suite].get_verifier(sender_pub_key)
+    except Exception:
+        return None  # not a usable public key for this suite
+
+    valid_signature = verifier.verify(decrypted_payload, signature)
 
     if not valid_signature: 
         return None
 
+    try:
+        payload = json.loads(decrypted_payload.decode())
+    except ValueError:
+        return None
+
     post_data = {
         "sender_pub_key": sender_pub_key,
-        "payload": json.loads(decrypted_payload.decode())
+        "payload": payload,
+        "group_key_id": blake.group_key_id(group_key).hex(),
     }
 
     return post_data
@@ -95,6 +558,7 @@ if __name__ == "__main__":
     grup_key = b'some_group_key_1234567890'  # Example group key (must be bytes)
 
     rsa_key_pair = rsa.generate_rsa_keys()
+    ed25519_key_pair = ed25519.generate_ed25519_keys()
 
     payload = create_payload(
         endpoint='peer_endpoint',
@@ -105,7 +569,8 @@ if __name__ == "__main__":
     psot = create_post(
             key_pair=rsa_key_pair,
             group_key=grup_key,
-            payload=payload
+            payload=payload,
+            include_pub_key=True
         )
 
 
@@ -115,5 +580,18 @@ if __name__ == "__main__":
     readed_post = read_post(psot, grup_key)
     print(readed_post)
 
+    psot = create_post(
+            key_pair=ed25519_key_pair,
+            group_key=grup_key,
+            payload=payload,
+            post_format=FORMAT_COMPACT
+        )
+
+    print('\n\n\n\n')
+    print(psot)
+    print(f"{len(psot)} bytes")
+    known_keys = {sender_key_id(ed25519_key_pair[1]): ed25519_key_pair[1]}
+    print(read_post(psot, grup_key, known_keys=known_keys))
+
 
     
\ No newline at end of file
@@ -0,0 +1,156 @@
+from typing import Protocol, Optional, List, Iterator, runtime_checkable
+from functools import lru_cache
+import re
+
+
+_DESCRIPTION = re.compile(r"\[group:(?P<group>[^\]]*)\]-\[owner:(?P<owner>[^\]]*)\]")
+
+
+@runtime_checkable
+class RendezvousBackend(Protocol):
+    """
+    What Group needs from a rendezvous point.
+
+    Posts are exchanged as gist-shaped dicts:
+        {
+            "id": str,
+            "description": "[group:<group>]-[owner:<owner>]",
+            "updated_at": ISO 8601 str,
+            "files": {"user_data.txt": {"content": str | None, "raw_url": str, "size": int}},
+        }
+
+    Implementations:
+        gist_wrapper.GitHubGistUserStore - GitHub gists
+        local_store.DirectoryUserStore   - a shared directory
+        local_store.LocalGistServer      - in-process HTTP stand-in for the gist API,
+                                           used through GitHubGistUserStore(base_url=...)
+
+    async_gist_wrapper.AsyncGitHubGistUserStore mirrors this API with coroutines
+    for asyncio callers. It is not an implementation (isinstance still passes, the
+    names match), Group cannot use it.
+    """
+
+    owner: str
+    group: str
+    gist_id: Optional[str]
+
+    # Set by get/iter_changed_gists_for_owners once a fetch is done, None before:
+    #   {"strategy", "complete", "requests", "gists_listed", "gists_matched",
+    #    "seconds", ...}, implementations may add their own entries
+    last_fetch: Optional[dict]
+
+    def upsert_user(self, content: str) -> str:
+        """
+        Create or update our own post, returns its id.
+        """
+        ...
+
+    def get_user_content(self) -> str:
+        """
+        Content of our own post (the one behind gist_id), raises if there is none.
+        """
+        ...
+
+    def get_changed_gists_by_key_discription(self, key: str, full: bool = False) -> List[dict]:
+        """
+        List posts with key in their description, only those changed since the
+        previous call unless full is set.
+        """
+        ...
+
+    def get_changed_gists_for_owners(self, key: str, owners: List[str], full: bool = False) -> List[dict]:
+        """
+        Like get_changed_gists_by_key_discription, but only posts owned by one of owners,
+        fetched however is cheapest. Records the strategy and its cost in `last_fetch`,
+        whose "complete" entry says whether posts missing from the result were deleted.
+        """
+        ...
+
+    def iter_changed_gists_by_key_discription(self, key: str, full: bool = False) -> Iterator[List[dict]]:
+        """
+        get_changed_gists_by_key_discription in batches, each yielded as soon as it is listed.
+        """
+        ...
+
+    def iter_changed_gists_for_owners(self, key: str, owners: List[str], full: bool = False) -> Iterator[List[dict]]:
+        """
+        get_changed_gists_for_owners in batches, each yielded as soon as it is listed.
+        """
+        ...
+
+    def get_group_users(self) -> List[dict]:
+        """
+        List the posts carrying our own group/owner description.
+        """
+        ...
+
+    def get_gists_contents(self, gists: List[dict]) -> List[dict]:
+        """
+        Fetch the contents of the listed posts, one {filename: content} dict per post, in order.
+        """
+        ...
+
+    def find_own_gist_id(self) -> Optional[str]:
+        """
+        Id of our existing post for this group, if there is one.
+        """
+        ...
+
+    def delete_gist(self, gist_id: str) -> None:
+        """
+        Delete one of our own posts.
+        """
+        ...
+
+
+def format_description(group: str, owner: str) -> str:
+    return f"[group:{group}]-[owner:{owner}]"
+
+
+@lru_cache(maxsize=4096)
+def parse_description(description: str) -> Optional[tuple[str, str]]:
+    """
+    (group, owner) out of a "[group:<group>]-[owner:<owner>]" description,
+    None if it is not one of ours.
+    """
+    match = _DESCRIPTION.fullmatch(description or "")
+    if match is None:
+        return None
+    return match.group("group"), match.group("owner")
+
+
+def _post_owner(gist: dict, group: str) -> Optional[str]:
+    """
+    Owner of a post in group, None if the gist is not one (see index_posts).
+    """
+    fields = parse_description(gist.get("description"))
+    if fields is None or fields[0] != group:
+        return None
+
+    login = (gist.get("owner") or {}).get("login")
+    if login is not None and login != fields[1]:
+        return None
+    return fields[1]
+
+
+def index_posts(gists: List[dict], group: str) -> dict:
+    """
+    owner -> posts of that owner in group, out of a listing.
+
+    Only exact group matches are kept (so "net" does not pick up "net-staging"),
+    and posts whose description names someone other than the account that owns
+    the gist are dropped, all without downloading any content.
+    """
+    index = {}
+    for gist in gists:
+        owner = _post_owner(gist, group)
+        if owner is not None:
+            index.setdefault(owner, []).append(gist)
+    return index
+
+
+def group_posts(gists: List[dict], group: str) -> List[dict]:
+    """
+    The posts of group out of a listing, in listing order, filtered like index_posts.
+    """
+    return [gist for gist in gists if _post_owner(gist, group) is not None]
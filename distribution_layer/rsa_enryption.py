@@ -1,6 +1,13 @@
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives import hashes
+from functools import lru_cache
+import time
+
+_PSS = padding.PSS(
+    mgf=padding.MGF1(hashes.SHA256()),
+    salt_length=padding.PSS.MAX_LENGTH
+)
 
 def generate_rsa_keys():
     """
@@ -54,20 +61,65 @@ def load_rsa_private_key(pem_private: bytes):
     return private_key
 
 
+class Signer:
+    """
+    Signs with a private key that is parsed once.
+    """
+
+    def __init__(self, private_key: bytes):
+        """
+        :param private_key: PEM encoded RSA private key
+        """
+        self.private_key = load_rsa_private_key(private_key)
+
+    def sign(self, message: bytes) -> bytes:
+        return self.private_key.sign(message, _PSS, hashes.SHA256())
+
+
+class Verifier:
+    """
+    Verifies against a public key that is parsed once.
+    """
+
+    def __init__(self, public_key: bytes):
+        """
+        :param public_key: PEM encoded RSA public key
+        """
+        self.public_key = load_rsa_public_key(public_key)
+
+    def verify(self, message: bytes, signature: bytes) -> bool:
+        """
+        Returns True if valid, False otherwise.
+        """
+        try:
+            self.public_key.verify(signature, message, _PSS, hashes.SHA256())
+            return True
+        except Exception:
+            return False
+
+
+@lru_cache(maxsize=16)
+def get_signer(private_key: bytes) -> Signer:
+    """
+    Cached Signer for a PEM private key.
+    """
+    return Signer(private_key)
+
+
+@lru_cache(maxsize=4096)
+def get_verifier(public_key: bytes) -> Verifier:
+    """
+    Cached Verifier for a PEM public key, so verifying a known sender costs
+    only the RSA operation.
+    """
+    return Verifier(public_key)
+
+
 def sign_message(private_key: bytes, message: bytes) -> bytes:
     """
     Sign a message using the RSA private key.
     """
-    private_key = load_rsa_private_key(private_key)
-    signature = private_key.sign(
-        message,
-        padding.PSS(
-            mgf=padding.MGF1(hashes.SHA256()),
-            salt_length=padding.PSS.MAX_LENGTH
-        ),
-        hashes.SHA256()
-    )
-    return signature
+    return get_signer(private_key).sign(message)
 
 
 def verify_signature(public_key: bytes, message: bytes, signature: bytes) -> bool:
@@ -75,20 +127,7 @@ def verify_signature(public_key: bytes, message: bytes, signature: bytes) -> boo
     Verify a message's signature using the RSA public key.
     Returns True if valid, False otherwise.
     """
-    public_key = load_rsa_public_key(public_key)
-    try:
-        public_key.verify(
-            signature,
-            message,
-            padding.PSS(
-                mgf=padding.MGF1(hashes.SHA256()),
-                salt_length=padding.PSS.MAX_LENGTH
-            ),
-            hashes.SHA256()
-        )
-        return True
-    except Exception:
-        return False
+    return get_verifier(public_key).verify(message, signature)
 
 
 
@@ -177,7 +216,46 @@ class RSAUser:
 
 
 
+def bench1(n: int = 300):
+    """
+    Per post signature check: parsing the PEM on every call (as before the
+    key cache) against a cached Verifier.
+    """
+    pem_private, pem_public = generate_rsa_keys()
+    message = b'{"endpoint": "[::1]:51820", "username": "bench", "wg_pk": "x"}'
+    signature = sign_message(pem_private, message)
+
+    start = time.perf_counter()
+    for _ in range(n):
+        load_rsa_public_key(pem_public).verify(signature, message, _PSS, hashes.SHA256())
+    uncached = (time.perf_counter() - start) / n
+
+    start = time.perf_counter()
+    for _ in range(n):
+        get_verifier(pem_public).verify(message, signature)
+    cached = (time.perf_counter() - start) / n
+
+    print(f"verify, PEM parsed per call: {uncached * 1e6:8.1f} us/post")
+    print(f"verify, cached Verifier:     {cached * 1e6:8.1f} us/post ({uncached / cached:.1f}x)")
+
+    start = time.perf_counter()
+    for _ in range(n // 10):
+        load_rsa_private_key(pem_private).sign(message, _PSS, hashes.SHA256())
+    uncached = (time.perf_counter() - start) / (n // 10)
+
+    start = time.perf_counter()
+    for _ in range(n // 10):
+        sign_message(pem_private, message)
+    cached = (time.perf_counter() - start) / (n // 10)
+
+    print(f"sign, PEM parsed per call:   {uncached * 1e6:8.1f} us/post")
+    print(f"sign, cached Signer:         {cached * 1e6:8.1f} us/post ({uncached / cached:.1f}x)")
+
+
 if __name__ == "__main__":
+    bench1()
+    print()
+
     pem_private, pem_public = generate_rsa_keys()
     key_pair_1 = (pem_private, pem_public)
     print("set 1 of Keys generated successfully.")
@@ -1,12 +1,14 @@
 #!./.venv/bin/python3
 from wireguard_manager.InterfaceManager import InterfaceManager
 from distribution_layer import group_manager
+from distribution_layer import gist_wrapper
 from distribution_layer import conf_loader
 import threading
 import time
 import json
 import os
 import utils
+from typing import Optional
 
 
 '''group_manager.test1()
@@ -73,7 +75,8 @@ class NetManager():
             username = input("Enter your username: ").strip()
             group_name = input("Enter the group name: ").strip()
             group_key = input("Enter the group key: ").strip()
-            conf_loader.create_config_file(token, username, group_name, group_key)
+            signature_suite = input("Signature suite, rsa or ed25519 [rsa]: ").strip().lower() or "rsa"
+            conf_loader.create_config_file(token, username, group_name, group_key, signature_suite)
         
         print(f"[*] Loading config from {self.distribute_config_file}...")
         config = conf_loader.load_config_file()
@@ -91,9 +94,20 @@ class NetManager():
             group=config["group_name"],
             group_key=config["group_key"].encode(),
             key_pair=key_pair,
-            public=True
+            public=True,
+            gist_id=config.get("gist_id"),
+            post_cache_path=config.get("post_cache_file", "post_cache.json"),
+            accepted_group_keys=[key.encode() for key in config.get("accepted_group_keys", [])],
+            graphql=config.get("graphql", False),
+            raw_cache_path=config.get("raw_cache_dir", "raw_cache"),
+            post_format=config.get("post_format", "json")
         )
         print(f"[+] Group manager initialized for group '{config['group_name']}'")
+
+        if config.get("gist_id") is None:
+            print(f"[*] Looking up our existing post...")
+            if self.group.find_own_post():
+                print(f"[+] Found existing post {self.group.gist_wrapper.gist_id}")
         
 
         
@@ -108,8 +122,21 @@ class NetManager():
         wg_pubkey = self.interface.show().get("public_key", "")
         if ipv6 and wg_pubkey:
             print(f"[*] Posting endpoint information to group...")
-            self.group.create_and_post(f"{ipv6}:51820", wg_pubkey)
+            gist_id = self.group.create_and_post(f"{ipv6}:51820", wg_pubkey)
             print(f"[+] Endpoint posted successfully")
+
+            # Remember our post so the next start updates it instead of creating another
+            if gist_id != config.get("gist_id"):
+                conf_loader.update_config_file({"gist_id": gist_id})
+
+            # Old posts of ours only slow down everyone's scans
+            try:
+                report = self.group.collect_garbage()
+                if report["deleted"]:
+                    print(f"[+] Deleted {report['deleted']} stale post(s), saving {report['requests_saved_per_poll']} request(s) "
+                          f"and {report['bytes_saved_per_poll']} bytes per scan ({report['remaining_stale']} left)")
+            except Exception as e:
+                print(f"[-] Stale post cleanup failed: {e}")
         
         # Start peer discovery thread
         print(f"[*] Starting peer discovery thread...")
@@ -135,68 +162,95 @@ class NetManager():
         """Background thread: continuously discover and update peers"""
 
         threshold = 30
+        apply_interval = 1.0
 
         print("[*] Peer discovery thread started")
         config = conf_loader.load_config_file()
         known_members = config["members"]
+        # Each peer needs its own tunnel addresses: wg moves an allowed ip to
+        # the last peer given it, so one shared range would flap every cycle.
+        # Members without their own only get the default when their peer is created
+        allowed_ips_by_name = {m["name"]: m.get("allowed_ips") for m in known_members}
+        default_allowed_ips = config.get("default_allowed_ips", ["10.0.0.0/24"])
+        unassigned = [name for name, ips in allowed_ips_by_name.items() if not ips]
+        if unassigned:
+            print(f"[!] No allowed_ips in the config for: {', '.join(unassigned)}")
+            print(f"    New peers of these members get {default_allowed_ips}, which only one peer can hold at a time")
         
         while self.running:
             try:
-                # Get known members from group
-                members_info = self.group.get_known_members(known_members)
-
-                
-                if members_info:
-                    print(f"[*] Found {len(members_info)} known member(s), updating WireGuard...")
-                
-                # Add/update peers in WireGuard
-                for member in members_info:
-
-                    payload = member["payload"]
-                    issued_at = payload['issued_at']
-                    #print(issued_at)
-                    
-                    self._add_or_update_peer_live(member)
-                    print(f"    [+] Updated peer: {member['name']} posted at {issued_at}")
+                # Apply known members' posts while they are read: the first
+                # right away, then whatever came in, at most once per
+                # apply_interval, each batch as one `wg set`. The stream ends
+                # with every member's newest post, so peers settle on it
+                updated = 0
+                pending = []
+                last_apply = 0.0
+                for member in self.group.iter_known_members(known_members):
+                    pending.append(member)
+                    if time.time() - last_apply >= apply_interval:
+                        updated += self._apply_members_live(pending, allowed_ips_by_name, default_allowed_ips)
+                        pending = []
+                        last_apply = time.time()
+                updated += self._apply_members_live(pending, allowed_ips_by_name, default_allowed_ips)
+                self.group.post_cache.save()
+
+                fetch = self.group.gist_wrapper.last_fetch
+                if fetch:
+                    print(f"[*] Listed {fetch['gists_listed']} post(s) by {fetch['strategy']} fetch, "
+                          f"{fetch['requests']} request(s) in {fetch['seconds']:.2f}s")
+                if updated:
+                    stats = self.interface.snapshot_stats()
+                    print(f"[*] {updated} peer update(s) applied, "
+                          f"wg snapshots: {stats['hits']} hit(s), {stats['misses']} miss(es)")
                 
                 # Sleep before next discovery
                 time.sleep(threshold)  # Poll every [threshold] seconds
+            except gist_wrapper.RateLimitExceeded as e:
+                budget = self.group.gist_wrapper.scheduler.budget()
+                print(f"[-] Peer discovery deferred, rate limit budget low: {e}")
+                print(f"    remaining {budget['remaining']}/{budget['limit']}, resets at {budget['reset_at']}")
+                time.sleep(threshold)
             except Exception as e:
                 print(f"[-] Error in peer discovery: {e}")
                 time.sleep(threshold)
 
-    def _add_or_update_peer_live(self, member_info: dict):
-        """Add or update a peer in live WireGuard interface"""
+    def _apply_members_live(self, members: list[dict], allowed_ips_by_name: dict, default_allowed_ips: list[str]) -> int:
+        """
+        Add or update the peers of members in the live WireGuard interface, in one `wg set`.
+        A member without allowed_ips in the config keeps whatever allowed ips its peer has,
+        or gets default_allowed_ips when its peer is created.
+        """
+        if not members:
+            return 0
+
+        peers = []
+        for member in members:
+            payload = member["payload"]
+            peers.append({
+                "public_key": payload["wg_pk"],
+                "endpoint": payload["endpoint"],
+                "allowed_ips": allowed_ips_by_name.get(member["name"]),
+                "persistent_keepalive": 25,
+            })
+
         try:
-            payload = member_info["payload"]
-            endpoint = payload["endpoint"]
-            wg_pk = payload["wg_pk"]
-            allowed_ips = ["10.0.0.0/24"]  # Adjust as needed
-            
-            # Check if peer already exists
-            existing_peers = self.interface.get_peers()
-            
-            if wg_pk in existing_peers:
-                # Update existing peer
-                self.interface.update_peer(
-                    wg_pk,
-                    endpoint=endpoint,
-                    allowed_ips=allowed_ips,
-                    persistent_keepalive=25
-                )
-            else:
-                # Create new peer
-                self.interface.create_peer(
-                    wg_pk,
-                    endpoint=endpoint,
-                    allowed_ips=allowed_ips,
-                    persistent_keepalive=25
-                )
+            written = set(self.interface.apply_peers(peers, default_allowed_ips=default_allowed_ips))
         except Exception as e:
-            print(f"[-] Failed to add/update peer: {e}")
+            print(f"[-] Failed to add/update peers: {e}")
+            return 0
 
-    def add_friend(self, name: str, rsa_pub_key: str):
-        """Add a peer to the local config"""
+        for member in members:
+            if member["payload"]["wg_pk"] in written:
+                print(f"    [+] Updated peer: {member['name']} posted at {member['payload']['issued_at']}")
+        return len(written)
+
+    def add_friend(self, name: str, rsa_pub_key: str, allowed_ips: Optional[list[str]] = None):
+        """
+        Add a peer to the local config
+
+        :param allowed_ips: Tunnel addresses routed to this peer, e.g. ["10.0.0.2/32"]
+        """
 
         rsa_pub_key = rsa_pub_key.replace('\\n','\n').replace(' ','')
 
@@ -209,7 +263,10 @@ class NetManager():
             print(f"[-] Member '{name}' already exists")
             return
         
-        members.append({"name": name, "rsa_public_key": rsa_pub_key})
+        member = {"name": name, "rsa_public_key": rsa_pub_key}
+        if allowed_ips:
+            member["allowed_ips"] = allowed_ips
+        members.append(member)
         config["members"] = members
         
         with open(self.distribute_config_file, "w") as f:
@@ -257,6 +314,7 @@ class NetManager():
             print(f"[+] Member '{name}' removed from config")
 
 
+
 if __name__ == "__main__":
     # Example usage
 
@@ -287,8 +345,10 @@ if __name__ == "__main__":
                     if peer_name.lower() == 'done':
                         break
                     peer_pubkey = input(f"  Enter {peer_name}'s RSA public key: ").strip()
+                    peer_ips = input(f"  Enter {peer_name}'s tunnel address(es), comma separated (optional): ").strip()
                     if peer_pubkey:
-                        manager.add_friend(peer_name, peer_pubkey)
+                        allowed_ips = [ip.strip() for ip in peer_ips.split(",") if ip.strip()]
+                        manager.add_friend(peer_name, peer_pubkey, allowed_ips or None)
                         print()
                 print("[+] Done adding peers\n")
             
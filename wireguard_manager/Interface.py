@@ -3,12 +3,26 @@ from wireguard_manager  import peer
 from wireguard_manager.utils import run_command
 import json
 import re
+import threading
+import time
+import ipaddress
 
 # manage a live interface and its peers
 class Interface:
-    def __init__(self, name: str):
+    def __init__(self, name: str, snapshot_ttl: float = 2.0):
+        """
+        :param snapshot_ttl: Seconds a show() snapshot is reused for (0 disables the cache).
+                             Our own `wg set` writes drop it right away.
+        """
         self.name = name
 
+        self.snapshot_ttl = snapshot_ttl
+        self.snapshot_hits = 0
+        self.snapshot_misses = 0
+        self._snapshot = None
+        self._snapshot_at = 0.0
+        self._snapshot_lock = threading.Lock()
+
     # ---- Interface state ----
 
     def _is_up(self) -> bool:
@@ -23,12 +37,37 @@ class Interface:
         except Exception:
             return False
 
-    def show(self) -> dict:
-        """Raw parsed output of `wg show <iface>`"""
+    def show(self, refresh: bool = False) -> dict:
+        """
+        Parsed output of `wg show <iface> dump`, served from a snapshot
+        younger than snapshot_ttl unless refresh is set.
+        The result is shared, do not modify it.
+        """
+        with self._snapshot_lock:
+            now = time.monotonic()
+            if not refresh and self._snapshot is not None and now - self._snapshot_at < self.snapshot_ttl:
+                self.snapshot_hits += 1
+                return self._snapshot
+
+            self.snapshot_misses += 1
+            self._snapshot = self._read_snapshot()
+            self._snapshot_at = now
+            return self._snapshot
+
+    def invalidate(self) -> None:
+        """Drop the snapshot, the next show() reads the interface again"""
+        with self._snapshot_lock:
+            self._snapshot = None
+
+    def snapshot_stats(self) -> dict:
+        return {"hits": self.snapshot_hits, "misses": self.snapshot_misses, "ttl": self.snapshot_ttl}
+
+    def _read_snapshot(self) -> dict:
+        """Fork `ip link show` and `wg show <iface> dump` and parse them"""
         if self._is_up():
             try:
-                output = run_command(f"wg show {self.name}")
-                return self._parse_wg_show(output)
+                output = run_command(f"wg show {self.name} dump")
+                return self._parse_wg_dump(output)
             except Exception as e:
                 raise RuntimeError(f"Failed to show interface {self.name}: {e}")
         else:
@@ -38,69 +77,61 @@ class Interface:
                 "public_key": None,
                 "private_key": None,
                 "listening_port": None,
+                "fwmark": None,
                 "peers": {}
             }
             return result  # Return empty data if interface is down
     
-    def _parse_wg_show(self, output: str) -> dict:
-        """Parse `wg show <iface>` output into structured data"""
+    def _parse_wg_dump(self, output: str) -> dict:
+        """
+        Parse `wg show <iface> dump` output into structured data.
+
+        The dump is tab separated, one line for the interface:
+            private-key  public-key  listen-port  fwmark
+        then one line per peer:
+            public-key  preshared-key  endpoint  allowed-ips  latest-handshake  rx  tx  persistent-keepalive
+        Byte counters are exact ints, latest_handshake is a unix epoch (None if never).
+        """
         result = {
             "interface": self.name,
             "state": "up",
             "public_key": None,
             "private_key": None,
             "listening_port": None,
+            "fwmark": None,
             "peers": {}
         }
-        
-        lines = output.strip().split('\n')
-        current_peer = None
-        
-        for line in lines:
-            #print(f"Parsing line: {line}")  # Debug print
-            line = line.strip()
-            if not line:
+
+        lines = output.splitlines()
+        if not lines:
+            return result
+
+        fields = lines[0].split('\t')
+        if len(fields) == 4:
+            result["private_key"] = _none(fields[0])
+            result["public_key"] = _none(fields[1])
+            result["listening_port"] = int(fields[2]) if fields[2].isdigit() else None
+            result["fwmark"] = _none(fields[3], "off")
+
+        peers = result["peers"]
+        for line in lines[1:]:
+            fields = line.split('\t')
+            if len(fields) != 8:
                 continue
-                
-            if line.startswith('interface:'):
-                result["interface"] = line.split(':', 1)[1].strip()
-            elif line.startswith('public key:'):
-                result["public_key"] = line.split(':', 1)[1].strip()
-            elif line.startswith('private key:'):
-                result["private_key"] = line.split(':', 1)[1].strip()
-            elif line.startswith('listening port:'):
-                result["listening_port"] = int(line.split(':', 1)[1].strip())
-            elif line.startswith('peer:'):
-                current_peer = line.split(':', 1)[1].strip()
-                result["peers"][current_peer] = {
-                    "public_key": current_peer,
-                    "endpoint": None,
-                    "allowed_ips": [],
-                    "latest_handshake": None,
-                    "rx_bytes": 0,
-                    "tx_bytes": 0,
-                    "persistent_keepalive": None
-                }
-            elif current_peer and line.startswith('endpoint:'):
-                result["peers"][current_peer]["endpoint"] = line.split(':', 1)[1].strip()
-            elif current_peer and line.startswith('allowed ips:'):
-                ips = line.split(':', 1)[1].strip()
-                result["peers"][current_peer]["allowed_ips"] = [ip.strip() for ip in ips.split(',')]
-            elif current_peer and line.startswith('latest handshake:'):
-                result["peers"][current_peer]["latest_handshake"] = line.split(':', 1)[1].strip()
-            elif current_peer and line.startswith('transfer:'):
-                transfer = line.split(':', 1)[1].strip()
-                parts = transfer.split(',')
-                if len(parts) >= 2:
-                    rx = parts[0].strip().split()[0]
-                    tx = parts[1].strip().split()[0]
-                    result["peers"][current_peer]["rx_bytes"] = float(rx)
-                    result["peers"][current_peer]["tx_bytes"] = float(tx)
-            elif current_peer and line.startswith('persistent keepalive:'):
-                keepalive = line.split(':', 1)[1].strip()
-                if keepalive != "off":
-                    result["peers"][current_peer]["persistent_keepalive"] = int(keepalive.split()[1])
-        
+
+            public_key, preshared_key, endpoint, allowed_ips, handshake, rx, tx, keepalive = fields
+            allowed_ips = _none(allowed_ips)
+            peers[public_key] = {
+                "public_key": public_key,
+                "preshared_key": _none(preshared_key),
+                "endpoint": _none(endpoint),
+                "allowed_ips": allowed_ips.split(',') if allowed_ips else [],
+                "latest_handshake": int(handshake) or None,
+                "rx_bytes": int(rx),
+                "tx_bytes": int(tx),
+                "persistent_keepalive": None if keepalive == "off" else int(keepalive)
+            }
+
         return result
 
     # ---- Peer management (NO config files) ----
@@ -126,6 +157,8 @@ class Interface:
             run_command(f"wg set {self.name} peer {public_key} remove")
         except Exception as e:
             raise RuntimeError(f"Failed to remove peer {public_key}: {e}")
+        finally:
+            self.invalidate()
 
     def create_peer(
         self,
@@ -136,25 +169,14 @@ class Interface:
         persistent_keepalive: int | None = None,
     ) -> None:
         """Create a new peer"""
-        if not allowed_ips:
-            allowed_ips = []
-        
-        cmd_parts = [f"wg set {self.name} peer {public_key}"]
-        
-        if allowed_ips:
-            ips = ",".join(allowed_ips)
-            cmd_parts.append(f"allowed-ips {ips}")
-        
-        if endpoint:
-            cmd_parts.append(f"endpoint {endpoint}")
-        
-        if persistent_keepalive is not None:
-            cmd_parts.append(f"persistent-keepalive {persistent_keepalive}")
+        clause = _peer_clause(public_key, endpoint, allowed_ips, persistent_keepalive)
         
         try:
-            run_command(" ".join(cmd_parts))
+            run_command(f"wg set {self.name} {clause}")
         except Exception as e:
             raise RuntimeError(f"Failed to create peer {public_key}: {e}")
+        finally:
+            self.invalidate()
 
     def update_peer(
         self,
@@ -186,6 +208,76 @@ class Interface:
             run_command(" ".join(cmd_parts))
         except Exception as e:
             raise RuntimeError(f"Failed to update peer {public_key}: {e}")
+        finally:
+            self.invalidate()
+
+    def apply_peers(
+        self,
+        peers: list[dict],
+        peers_per_call: int = 1000,
+        default_allowed_ips: list[str] | None = None,
+    ) -> list[str]:
+        """
+        Bring many peers to the given settings with one `wg set` carrying a
+        peer clause per change (split every peers_per_call peers to stay far
+        below the argument size limit).
+
+        Each entry: {"public_key", "endpoint", "allowed_ips", "persistent_keepalive"},
+        or {"public_key", "remove": True}. allowed_ips None leaves an existing
+        peer's allowed ips as they are, and gives a new peer default_allowed_ips
+        (a warning is printed if that leaves it with none, it would carry no
+        traffic). Peers already set up like this are
+        skipped, compared against the snapshot, so nothing is run if nothing changed.
+        A peer listed more than once ends up as its last entry says.
+
+        :return: public keys of the peers written
+        """
+        current = self.show()["peers"]
+
+        # Only the last entry of a peer counts, an earlier one must neither be
+        # written nor make the last one look like a no-op
+        last_entries = {}
+        for peer_info in peers:
+            last_entries.pop(peer_info["public_key"], None)
+            last_entries[peer_info["public_key"]] = peer_info
+        peers = list(last_entries.values())
+
+        written = []
+        clauses = []
+        for peer_info in peers:
+            public_key = peer_info["public_key"]
+            if peer_info.get("remove"):
+                if public_key in current:
+                    written.append(public_key)
+                    clauses.append(f"peer {public_key} remove")
+                continue
+
+            endpoint = peer_info.get("endpoint")
+            allowed_ips = peer_info.get("allowed_ips")
+            persistent_keepalive = peer_info.get("persistent_keepalive")
+            if public_key in current:
+                if peer_matches(current[public_key], endpoint, allowed_ips, persistent_keepalive):
+                    continue
+            elif allowed_ips is None:
+                allowed_ips = default_allowed_ips
+                if not allowed_ips:
+                    print(f"[!] Creating peer {public_key} without allowed ips, it will carry no traffic")
+
+            written.append(public_key)
+            clauses.append(_peer_clause(public_key, endpoint, allowed_ips, persistent_keepalive))
+
+        if not clauses:
+            return []
+
+        try:
+            for i in range(0, len(clauses), peers_per_call):
+                run_command(f"wg set {self.name} " + " ".join(clauses[i:i + peers_per_call]))
+        except Exception as e:
+            raise RuntimeError(f"Failed to apply {len(clauses)} peer(s): {e}")
+        finally:
+            self.invalidate()
+
+        return written
 
     # ---- Peer inspection ----
 
@@ -201,3 +293,52 @@ class Interface:
             raise ValueError(f"Peer {public_key} not found")
         return peer.Peer(self, public_key) 
 
+
+
+def _none(value: str, *empty: str) -> str | None:
+    """A dump field, None for "(none)" (or any of empty)"""
+    if value == "(none)" or value in empty:
+        return None
+    return value
+
+
+def _peer_clause(
+    public_key: str,
+    endpoint: str | None,
+    allowed_ips: list[str] | None,
+    persistent_keepalive: int | None,
+) -> str:
+    """The `peer ...` part of a `wg set` command"""
+    cmd_parts = [f"peer {public_key}"]
+
+    if allowed_ips:
+        ips = ",".join(allowed_ips)
+        cmd_parts.append(f"allowed-ips {ips}")
+
+    if endpoint:
+        cmd_parts.append(f"endpoint {endpoint}")
+
+    if persistent_keepalive is not None:
+        cmd_parts.append(f"persistent-keepalive {persistent_keepalive}")
+
+    return " ".join(cmd_parts)
+
+
+def _split_endpoint(endpoint: str | None):
+    """(ip address, port) of "host:port" / "[v6]:port", as given if it does not parse"""
+    if not endpoint or ":" not in endpoint:
+        return endpoint
+    host, port = endpoint.rsplit(":", 1)
+    try:
+        return ipaddress.ip_address(host.strip("[]")), port
+    except ValueError:
+        return endpoint
+
+
+def peer_matches(current: dict, endpoint: str | None, allowed_ips: list[str] | None, persistent_keepalive: int | None) -> bool:
+    """True if a peer of `wg show` already has these settings (allowed_ips None: any)"""
+    return (
+        _split_endpoint(current.get("endpoint")) == _split_endpoint(endpoint)
+        and (allowed_ips is None or set(current.get("allowed_ips") or []) == set(allowed_ips))
+        and current.get("persistent_keepalive") == persistent_keepalive
+    )
@@ -31,19 +31,17 @@ class Peer:
             "persistent_keepalive": peer_data["persistent_keepalive"],
         }
     
-    def _parse_handshake(self, handshake_str: str | None) -> datetime | None:
-        """Parse handshake string to datetime or None"""
-        if not handshake_str or handshake_str == "Never":
+    def _parse_handshake(self, handshake: int | str | None) -> datetime | None:
+        """Parse a handshake (unix epoch from `wg show dump`, 0 / None for never) to datetime or None"""
+        if not handshake or handshake == "Never":
             return None
-        
+
         try:
-            # Try to parse ISO format or common timestamp formats
-            return datetime.fromisoformat(handshake_str)
-        except:
+            return datetime.fromtimestamp(int(handshake))
+        except (TypeError, ValueError):
             try:
-                # If it's a Unix timestamp
-                return datetime.fromtimestamp(float(handshake_str))
-            except:
+                return datetime.fromisoformat(handshake)
+            except (TypeError, ValueError):
                 return None
 
     def last_handshake(self) -> datetime | None: